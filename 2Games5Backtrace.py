@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 # Backtrace 5 games before the inactive period starts
 # Less than 2 games for 2 consecutive months starts the inactive period
 inactive_length = [3, 10, 2, 
@@ -31,5 +30,7 @@ win_ratio = [0.528937728937729, 0.5325296735905045, 0.5247878678461816,
              0.6, 0.25, 0.75,
              0.2, 1.0]
 
-plt.scatter(win_ratio, inactive_length)
-plt.show()
\ No newline at end of file
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+    plt.scatter(win_ratio, inactive_length)
+    plt.show()
@@ -0,0 +1,19 @@
+# Shared analysis code for the Dota2 match scripts
+#
+# Importing the package reads nothing and plots nothing; matplotlib is only
+# imported by the scripts when they draw. The batch API of dota_analysis.api
+# is available at the top level, e.g. dota_analysis.inactivity_events(matches).
+# It is imported on first use, so `python -m dota_analysis.<module>` and
+# scripts that only need one module do not load the whole engine.
+
+api_names = ['make_matches', 'prepare', 'monthly_counts', 'inactivity_events',
+             'inactivity_ratios', 'rolling_rates', 'analyze_players', 'analyze_store']
+
+def __getattr__(name):
+    if name in api_names:
+        from dota_analysis import api
+        return getattr(api, name)
+    raise AttributeError("module 'dota_analysis' has no attribute " + repr(name))
+
+def __dir__():
+    return sorted(list(globals()) + api_names)
@@ -0,0 +1,93 @@
+# Batch API for using the analysis in-process, e.g. from a notebook or a
+# service that already has the matches in memory
+#
+# The functions take the matches of one player as a dict of arrays (see
+# make_matches), or many players as (user_id, matches) pairs, and return
+# arrays, dicts or the engine's results. Nothing is read from disk unless a
+# path is given, and nothing is plotted.
+#
+#     import dota_analysis
+#     matches = dota_analysis.make_matches(start_time, radiant_win, leaver_status, hero_id)
+#     window_start, counts = dota_analysis.monthly_counts(matches)
+#     events = dota_analysis.inactivity_events(matches, game_bar=5, backtrace=5)
+
+import numpy as np
+from dota_analysis import match_store
+from dota_analysis import engine
+from dota_analysis import rolling
+
+# Matches of one player as the dict of typed arrays the engine works on.
+# The arrays must be in chronological order; missing columns get the value
+# match_store uses for a missing field, so without leaver_status nobody left
+def make_matches(start_time, radiant_win, leaver_status=None, hero_id=None, player_slot=None):
+    given = {'start_time': start_time, 'radiant_win': radiant_win,
+             'leaver_status': leaver_status, 'hero_id': hero_id, 'player_slot': player_slot}
+    num_matches = len(start_time)
+    matches = dict()
+    for field, dtype, missing in match_store.COLUMNS:
+        if given[field] is None: matches[field] = np.full(num_matches, missing, dtype=dtype)
+        else: matches[field] = np.asarray(given[field], dtype=dtype)
+    return matches
+
+# Settings for a single player: nobody is left out for having few games
+def player_settings(settings=None):
+    result = engine.make_settings({'min_games': 0})
+    if settings is not None: result.update(settings)
+    return result
+
+# The engine's view of one player (see engine.prepare_player)
+def prepare(matches, settings=None, user_id=None):
+    return engine.prepare_player(user_id, matches, player_settings(settings))
+
+# (month index of counts[0], number of games in every month)
+def monthly_counts(matches, settings=None):
+    player = prepare(matches, settings)
+    return player['window_start'], player['counts']
+
+# With gap_days, inactive periods are breaks of at least that many days
+# between games instead of months with fewer than game_bar games
+def inactivity_collector(outcome, game_bar, backtrace, normalize=True, gap_days=None):
+    if gap_days is not None:
+        if outcome == 'win': return engine.DayGapWinCollector(gap_days, backtrace, normalize)
+        if outcome == 'leave': return engine.DayGapLeaveCollector(gap_days, backtrace, normalize)
+    elif outcome == 'win': return engine.InactiveWinCollector(game_bar, backtrace, normalize)
+    elif outcome == 'leave': return engine.InactiveLeaveCollector(game_bar, backtrace, normalize)
+    raise ValueError("unknown outcome " + str(outcome))
+
+# Inactive periods of one player and the win or leave ratio over the last
+# `backtrace` games before each: a dict of arrays start_month, period, games,
+# ratio and normalized (see engine.InactivityCollector.player_events). With
+# gap_days the periods are breaks between games and their lengths are in days
+def inactivity_events(matches, outcome='win', game_bar=5, backtrace=5, settings=None, gap_days=None):
+    collector = inactivity_collector(outcome, game_bar, backtrace, gap_days=gap_days)
+    return collector.player_events(prepare(matches, settings))
+
+# Ratios of one player grouped by the length of the inactive period, as the
+# scripts show them
+def inactivity_ratios(matches, outcome='win', game_bar=5, backtrace=5, normalize=True, settings=None,
+                      gap_days=None):
+    collector = inactivity_collector(outcome, game_bar, backtrace, normalize, gap_days)
+    return collector.player_ratios(prepare(matches, settings))
+
+# Win and leave rate of one player over the last N games and the last K days
+# at every match: a dict of arrays named like rolling.game_column and
+# rolling.day_column, plus start_time
+def rolling_rates(matches, games=(20,), days=(30,)):
+    return rolling.block_rates(matches['start_time'], matches['radiant_win'], matches['leaver_status'],
+                               [0, len(matches['start_time'])], games, days)
+
+# Run collectors (default: engine.default_collectors()) over (user_id,
+# matches) pairs in this process; return a dict collector name: result
+def analyze_players(players, collectors=None, settings=None):
+    if collectors is None: collectors = engine.default_collectors()
+    analyzer = engine.PlayerAnalyzer(collectors, settings)
+    overall = analyzer.start()
+    for user_id, matches in players:
+        partials = analyzer(user_id, matches)
+        if partials is not None: analyzer.merge(partials, overall)
+    return analyzer.finish(overall)
+
+# Same over a columnar store, with a process pool (see engine.run)
+def analyze_store(store_path, collectors=None, settings=None, processes=None):
+    if collectors is None: collectors = engine.default_collectors()
+    return engine.run(store_path, collectors, settings, processes)
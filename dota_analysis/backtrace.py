@@ -0,0 +1,30 @@
+# Prefix-sum index for the ratio of the last games before a month
+#
+# A player's outcomes (win or loss, left or stayed) are ordered by month and
+# summed cumulatively once. The ratio over the last N games up to any month is
+# then a subtraction of two prefix sums, with the month boundaries found by
+# searchsorted, instead of a walk back through the months.
+
+import numpy as np
+
+# Return (months, cumulative) where months are the sorted month indices of the
+# games and cumulative[i] is the number of positive outcomes in the first i games.
+# Games of the same month keep their order
+def build_index(month_index, outcomes):
+    month_index = np.asarray(month_index, dtype=np.int64)
+    order = np.argsort(month_index, kind='stable')
+    outcomes = np.asarray(outcomes)[order].astype(np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(outcomes)))
+    return (month_index[order], cumulative)
+
+# Number of positive outcomes and number of games among the last `backtrace`
+# games played after month `after` and up to month `until` (inclusive). When
+# fewer games were played in that window all of them are counted. Every
+# argument but the index may be an array
+def backtrace_window(index, after, until, backtrace):
+    months, cumulative = index
+    end = np.searchsorted(months, until, side='right')
+    begin = np.searchsorted(months, after, side='right')
+    num_games = np.minimum(np.maximum(end - begin, 0), backtrace)
+    positives = cumulative[end] - cumulative[end - num_games]
+    return positives, num_games
@@ -0,0 +1,159 @@
+# Benchmark of the analysis pipeline on synthetic corpora
+#
+# For every scale (number of players) a corpus is generated with
+# dota_analysis.synthetic (once, it is kept in the work directory), ingested
+# into a columnar store and analyzed. Every stage is timed separately:
+#   generate    writing the synthetic json files
+#   ingest      json files to the columnar store
+#   bucketing   monthly game counts and active window (engine.prepare_player)
+#   inactivity  inactive period detection
+#   backtrace   win and leave ratios before the inactive periods
+#   histogram   player table, distributions and hero statistics
+# Each scale runs in its own process, so its peak RSS is measured on its own.
+#
+#     python -m dota_analysis.benchmark --scales 1k,100k,1m --matches 200 --output benchmark.json
+# prints the throughput of every stage and writes the same numbers as json.
+
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+import numpy as np
+from dota_analysis import synthetic
+from dota_analysis import match_store
+from dota_analysis import engine
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+stages = ['generate', 'ingest', 'bucketing', 'inactivity', 'backtrace', 'histogram']
+
+# '1k' -> 1000, '1m' -> 1000000
+def parse_scale(text):
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    if factor != 1: text = text[:-1]
+    return int(float(text) * factor)
+
+# Peak resident set size of this process in bytes, None where it is not available
+def peak_rss():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': return peak # bytes on macOS, kilobytes elsewhere
+    return peak * 1024
+
+# Make the corpus unless the work directory already has one with the same settings
+def ensure_corpus(corpus_dir, settings):
+    settings_path = os.path.join(corpus_dir, 'corpus.json')
+    if os.path.exists(settings_path):
+        with open(settings_path) as settings_file:
+            if json.load(settings_file) == settings: return None
+    begin = time.perf_counter()
+    synthetic.generate(corpus_dir, settings)
+    seconds = time.perf_counter() - begin
+    with open(settings_path, 'w') as settings_file:
+        json.dump(settings, settings_file)
+    return seconds
+
+# Time every stage over the players of the store
+def analyze_store(store, game_bar, backtrace):
+    seconds = dict((stage, 0.0) for stage in stages[2:])
+    settings = engine.make_settings({'min_games': 0})
+    inactivity_collectors = [engine.InactiveWinCollector(game_bar, backtrace),
+                             engine.InactiveLeaveCollector(game_bar, backtrace)]
+    stats_collectors = [engine.PlayerStatsCollector(), engine.DistributionCollector(),
+                        engine.HeroStatsCollector()]
+    results = dict((collector.name, collector.start())
+                   for collector in inactivity_collectors + stats_collectors)
+    for user_id, matches in match_store.iter_players(store):
+        t0 = time.perf_counter()
+        player = engine.prepare_player(user_id, matches, settings)
+        t1 = time.perf_counter()
+        if engine.has_games(player): engine.inactive_runs(player, game_bar)
+        t2 = time.perf_counter()
+        for collector in inactivity_collectors:
+            collector.merge(collector.collect(player), results[collector.name])
+        t3 = time.perf_counter()
+        for collector in stats_collectors:
+            collector.merge(collector.collect(player), results[collector.name])
+        t4 = time.perf_counter()
+        seconds['bucketing'] += t1 - t0
+        seconds['inactivity'] += t2 - t1
+        seconds['backtrace'] += t3 - t2
+        seconds['histogram'] += t4 - t3
+    begin = time.perf_counter()
+    for collector in stats_collectors:
+        collector.finish(results[collector.name])
+    seconds['histogram'] += time.perf_counter() - begin
+    return seconds
+
+# Run every stage for one scale; called in a fresh worker process
+def run_scale(work_dir, corpus_settings, game_bar, backtrace):
+    name = '_'.join(str(corpus_settings[key]) for key in ['players', 'matches', 'seed'])
+    corpus_dir = os.path.join(work_dir, 'corpus_' + name)
+    store_dir = os.path.join(work_dir, 'store_' + name)
+    seconds = {'generate': ensure_corpus(corpus_dir, corpus_settings)}
+    begin = time.perf_counter()
+    num_players, num_matches = match_store.ingest(corpus_dir, store_dir)
+    seconds['ingest'] = time.perf_counter() - begin
+    store = match_store.load_store(store_dir)
+    seconds.update(analyze_store(store, game_bar, backtrace))
+    report = {'players': num_players, 'matches': num_matches,
+              'corpus_bytes': sum(os.path.getsize(path) for path in match_store.list_player_files(corpus_dir)),
+              'peak_rss_bytes': peak_rss(), 'stages': dict()}
+    for stage in stages:
+        if seconds[stage] is None: continue # the corpus was already there
+        report['stages'][stage] = {'seconds': seconds[stage],
+                                   'players_per_sec': num_players / max(seconds[stage], 1e-9),
+                                   'matches_per_sec': num_matches / max(seconds[stage], 1e-9)}
+    return report
+
+def print_report(report):
+    print("%8s %10s %12s %14s %16s" % ('players', 'stage', 'seconds', 'matches/sec', 'peak RSS (MB)'))
+    for scale in report['scales']:
+        peak = scale['peak_rss_bytes']
+        peak = '-' if peak is None else '%.1f' % (peak / 2.0 ** 20)
+        for stage in stages:
+            if stage not in scale['stages']: continue
+            timing = scale['stages'][stage]
+            print("%8d %10s %12.3f %14.0f %16s" % (scale['players'], stage, timing['seconds'],
+                                                    timing['matches_per_sec'], peak))
+
+def run(scales, work_dir, corpus_settings=None, game_bar=5, backtrace=5):
+    report = {'python': platform.python_version(), 'numpy': np.__version__,
+              'machine': platform.machine(), 'game_bar': game_bar, 'backtrace': backtrace,
+              'scales': []}
+    for players in scales:
+        settings = synthetic.make_settings(corpus_settings)
+        settings['players'] = players
+        with multiprocessing.Pool(1) as pool:
+            report['scales'].append(pool.apply(run_scale, (work_dir, settings, game_bar, backtrace)))
+    return report
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic corpora")
+    parser.add_argument('--scales', default='1k', help="comma separated player counts, e.g. 1k,100k,1m")
+    parser.add_argument('--work-dir', default='benchmark_data', help="where corpora and stores are kept")
+    parser.add_argument('--output', default=None, help="json file for the report")
+    parser.add_argument('--game-bar', type=int, default=5)
+    parser.add_argument('--backtrace', type=int, default=5)
+    for name in ['matches', 'gap_prob', 'hero_pool', 'seed']:
+        value = synthetic.default_settings[name]
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    corpus_settings = dict((name, getattr(args, name)) for name in ['matches', 'gap_prob', 'hero_pool', 'seed'])
+    scales = [parse_scale(scale) for scale in args.scales.split(',')]
+    report = run(scales, args.work_dir, corpus_settings, args.game_bar, args.backtrace)
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
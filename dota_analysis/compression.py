@@ -0,0 +1,128 @@
+# Compressed player files
+#
+# The *_allmatches.json files are very repetitive and compress several-fold.
+# Every loader reads player files through open_player_file, which decompresses
+# gzip (*_allmatches.json.gz) and zstd (*_allmatches.json.zst) files as a
+# stream. The format is taken from the first bytes of the file, so a
+# compressed file with the wrong extension is still read correctly, and
+# directories can mix plain and compressed files. zstd needs the zstandard
+# package (`pip install zstandard`); gzip works without it.
+#
+#     python -m dota_analysis.compression <json_dir> [--format zst|gz] [--level N] [--keep]
+# recompresses every plain player file under json_dir. Each compressed file is
+# checked against the original before the original is removed (kept with
+# --keep; the compressed copy is the one read from then on).
+
+import sys
+import os
+import gzip
+import shutil
+import hashlib
+import argparse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# (format, file name extension, magic bytes at the start of the file)
+formats = [('gz', '.gz', b'\x1f\x8b'),
+           ('zst', '.zst', b'\x28\xb5\x2f\xfd')]
+player_suffix = '_allmatches.json'
+default_levels = {'gz': 6, 'zst': 10}
+
+# Format of a file from its first bytes, or None for a plain file
+def detect_format(file_path):
+    with open(file_path, 'rb') as fh:
+        head = fh.read(4)
+    for name, extension, magic in formats:
+        if head.startswith(magic): return name
+    return None
+
+def is_player_file(name):
+    if name.endswith(player_suffix): return True
+    return plain_name(name) != name
+
+# The plain file name of a player file, compressed or not
+def plain_name(file_path):
+    for name, extension, magic in formats:
+        if file_path.endswith(player_suffix + extension): return file_path[:-len(extension)]
+    return file_path
+
+# Binary file object with the decompressed content of a player file
+def open_player_file(file_path):
+    file_format = detect_format(file_path)
+    if file_format == 'gz': return gzip.open(file_path, 'rb')
+    if file_format == 'zst':
+        if zstandard is None:
+            raise ImportError("reading " + file_path + " needs the zstandard package")
+        fh = open(file_path, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(fh, closefd=True)
+    return open(file_path, 'rb')
+
+# Decompressed content of a player file
+def read_player_bytes(file_path):
+    with open_player_file(file_path) as fh:
+        return fh.read()
+
+# Hash of the decompressed content, read in blocks
+def content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open_player_file(file_path) as fh:
+        block = fh.read(block_size)
+        while block:
+            digest.update(block)
+            block = fh.read(block_size)
+    return digest.hexdigest()
+
+# Write file_path compressed to file_path + extension, check that it
+# decompresses to the same content and return the new path
+def compress_file(file_path, file_format='zst', level=None):
+    if level is None: level = default_levels[file_format]
+    extension = [extension for name, extension, magic in formats if name == file_format][0]
+    target = file_path + extension
+    temp_path = target + '.tmp'
+    with open(file_path, 'rb') as source:
+        if file_format == 'gz':
+            with gzip.open(temp_path, 'wb', compresslevel=level) as compressed:
+                shutil.copyfileobj(source, compressed, 1 << 20)
+        else:
+            if zstandard is None: raise ImportError("zstd compression needs the zstandard package")
+            with open(temp_path, 'wb') as compressed:
+                zstandard.ZstdCompressor(level=level).copy_stream(source, compressed)
+    if content_hash(temp_path) != content_hash(file_path):
+        os.remove(temp_path)
+        raise ValueError("compressed copy of " + file_path + " does not match it")
+    os.replace(temp_path, target)
+    return target
+
+# Compress every plain player file under json_dir; return the bytes before and after
+def compress_directory(json_dir, file_format='zst', level=None, keep=False, verbose=False):
+    before, after = 0, 0
+    for root, dirs, files in os.walk(json_dir):
+        for name in files:
+            if not name.endswith(player_suffix): continue
+            file_path = os.path.join(root, name)
+            if detect_format(file_path) is not None: continue
+            target = compress_file(file_path, file_format, level)
+            before += os.path.getsize(file_path)
+            after += os.path.getsize(target)
+            if not keep: os.remove(file_path)
+            if verbose: print(target)
+    return before, after
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compress the player files of a directory")
+    parser.add_argument('json_dir')
+    parser.add_argument('--format', choices=[name for name, extension, magic in formats], default='zst')
+    parser.add_argument('--level', type=int, default=None)
+    parser.add_argument('--keep', action='store_true', help="keep the plain files")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    before, after = compress_directory(args.json_dir, args.format, args.level, args.keep, args.verbose)
+    if before == 0:
+        print("No plain player files under " + args.json_dir)
+        sys.exit(0)
+    print("Compressed " + str(before) + " bytes to " + str(after) + " bytes ("
+          + str(round(float(before) / max(after, 1), 1)) + "x)")
@@ -0,0 +1,94 @@
+# JSON decoder backends for the *_allmatches.json files
+#
+# The analysis only needs a few fields of every match (see match_store.COLUMNS),
+# which match_store.matches_to_columns copies straight into typed arrays. The
+# decoder is the first installed of:
+#   orjson    builds every match dict, but about twice as fast as json
+#   simdjson  (pysimdjson) lazy documents, only the fields that are looked up
+#             become Python objects; about as fast as orjson and lower memory
+#   json      the standard library
+# All backends give the same columns.
+#
+#     python -m dota_analysis.decoders <json_dir> [number of files]
+# decodes the largest player files with every installed backend and prints the
+# matches per second of each.
+
+import sys
+import os
+import json
+import time
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_simdjson(data):
+    # a new parser per document, so threads and workers never share one
+    return simdjson.Parser().parse(data)
+
+def load_orjson(data):
+    return orjson.loads(data)
+
+def load_json(data):
+    return json.loads(data)
+
+# (name, module or None if it is not installed, loader) in order of preference
+backends = [('orjson', orjson, load_orjson),
+            ('simdjson', simdjson, load_simdjson),
+            ('json', json, load_json)]
+
+def available_backends():
+    return [name for name, module, loader in backends if module is not None]
+
+def default_backend():
+    return available_backends()[0]
+
+# Decode the bytes of a player file into its list of matches. Each match only
+# needs to support get(field)
+def decode_matches(data, backend=None):
+    if backend is None: backend = default_backend()
+    for name, module, loader in backends:
+        if name == backend:
+            if module is None: raise ValueError("json backend not installed: " + backend)
+            return loader(data)
+    raise ValueError("unknown json backend: " + backend)
+
+
+# Decode the files with the backend, return (number of matches, seconds)
+def time_backend(file_paths, backend):
+    from dota_analysis import match_store
+    num_matches = 0
+    begin = time.perf_counter()
+    for file_path in file_paths:
+        columns = match_store.read_player_columns(file_path, backend)
+        num_matches += len(columns['start_time'])
+    return num_matches, time.perf_counter() - begin
+
+
+if __name__ == '__main__':
+    from dota_analysis import match_store
+    import numpy as np
+    if len(sys.argv) not in (2, 3):
+        print("usage: python -m dota_analysis.decoders <json_dir> [number of files]")
+        sys.exit(1)
+    num_files = int(sys.argv[2]) if len(sys.argv) == 3 else 10
+    file_paths = sorted(match_store.list_player_files(sys.argv[1]), key=os.path.getsize, reverse=True)
+    file_paths = file_paths[:num_files]
+    print("Decoding the " + str(len(file_paths)) + " largest player files")
+    expected = [match_store.read_player_columns(file_path, 'json') for file_path in file_paths]
+    for backend in available_backends():
+        num_matches, seconds = time_backend(file_paths, backend)
+        same = True
+        for file_path, expected_columns in zip(file_paths, expected):
+            columns = match_store.read_player_columns(file_path, backend)
+            for field in expected_columns:
+                same = same and np.array_equal(columns[field], expected_columns[field])
+        print("%-9s %10d matches/sec%s" % (backend, num_matches / max(seconds, 1e-9),
+                                           "" if same else "  (columns differ from json)"))
@@ -0,0 +1,127 @@
+# Density plots for scatters with too many points
+#
+# A scatter of every inactivity event or player draws one marker per point,
+# which takes minutes at corpus scale and hides everything under overplotting.
+# density_grid bins the points into a 2D grid with one bincount (and into
+# hexagons for a hexbin plot), and draw shows the counts as a heatmap or as
+# hexagons, so the drawing time depends on the grid size and not on the number
+# of points. The optional overlay is the mean of y in every x bin with its
+# normal confidence interval.
+#
+# An integer x (e.g. the length of the inactive period) with fewer distinct
+# values than bins gets one bin per value.
+
+import statistics
+import numpy as np
+
+# Edges of num_bins equal bins over the values
+def axis_edges(values, num_bins, value_range=None):
+    if value_range is None:
+        value_range = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+    low, high = value_range
+    if np.issubdtype(values.dtype, np.integer) and high - low + 1 <= num_bins:
+        return np.arange(low - 0.5, high + 1.5)
+    if high <= low: high = low + 1.0
+    return np.linspace(low, high, num_bins + 1)
+
+# Bin of every value for equal bins with these edges; values outside are -1
+def bin_index(values, edges):
+    num_bins = len(edges) - 1
+    index = np.floor((values - edges[0]) * (num_bins / (edges[-1] - edges[0]))).astype(np.int64)
+    np.clip(index, 0, num_bins - 1, out=index)
+    index[(values < edges[0]) | (values > edges[-1])] = -1
+    return index
+
+# Counts of the points in every cell and the mean of y in every x bin with its
+# interval. bins is a number or (x bins, y bins); ranges None or ((x low, x
+# high), (y low, y high)). Points with a nan are left out. Return a dict
+# x_edges, y_edges, counts[x bin, y bin], column_counts, means, low, high;
+# for kind 'hexbin' also the hexagons of hex_bins (see hex_bins)
+def density_grid(x, y, bins=100, ranges=None, confidence=0.95, kind='heatmap'):
+    x, y = np.asarray(x), np.asarray(y)
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    x_bins, y_bins = (bins, bins) if np.isscalar(bins) else bins
+    x_range, y_range = (None, None) if ranges is None else ranges
+    x_edges = axis_edges(x, x_bins, x_range)
+    y_edges = axis_edges(y, y_bins, y_range)
+    column = bin_index(x.astype(np.float64), x_edges)
+    row = bin_index(y.astype(np.float64), y_edges)
+    inside = (column >= 0) & (row >= 0)
+    column, row, y = column[inside], row[inside], y[inside].astype(np.float64)
+    num_columns, num_rows = len(x_edges) - 1, len(y_edges) - 1
+    counts = np.bincount(column * num_rows + row, minlength=num_columns * num_rows)
+    column_counts = np.bincount(column, minlength=num_columns)
+    sums = np.bincount(column, weights=y, minlength=num_columns)
+    squares = np.bincount(column, weights=y * y, minlength=num_columns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / column_counts
+        variance = np.maximum(squares / column_counts - means ** 2, 0) * column_counts / (column_counts - 1)
+        spread = statistics.NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(variance / column_counts)
+    grid = {'x_edges': x_edges, 'y_edges': y_edges,
+            'counts': counts.reshape(num_columns, num_rows),
+            'column_counts': column_counts,
+            'means': means, 'low': means - spread, 'high': means + spread}
+    if kind == 'hexbin':
+        x = x[inside].astype(np.float64)
+        grid['hexagons'] = hex_bins(x, y, num_columns, (x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+    return grid
+
+# Hexagonal binning on the lattice matplotlib's hexbin uses for the same
+# gridsize and extent: every point goes to the nearer center of two offset
+# rectangular lattices. Return (center x, center y, count) of the hexagons
+# with points, so that hexbin only has to draw one point per hexagon
+def hex_bins(x, y, gridsize, extent):
+    x_low, x_high, y_low, y_high = extent
+    num_x = gridsize
+    num_y = max(1, int(gridsize / np.sqrt(3)))
+    step_x = (x_high - x_low) / num_x
+    step_y = (y_high - y_low) / num_y
+    scaled_x = (x - x_low) / step_x
+    scaled_y = (y - y_low) / step_y
+    near_x, near_y = np.round(scaled_x), np.round(scaled_y)
+    low_x, low_y = np.floor(scaled_x), np.floor(scaled_y)
+    on_first = ((scaled_x - near_x) ** 2 + 3.0 * (scaled_y - near_y) ** 2
+                < (scaled_x - low_x - 0.5) ** 2 + 3.0 * (scaled_y - low_y - 0.5) ** 2)
+    # centers of the first lattice are at whole steps, of the second at half steps
+    center_x = np.where(on_first, near_x, low_x + 0.5)
+    center_y = np.where(on_first, near_y, low_y + 0.5)
+    cell = (2 * center_x).astype(np.int64) * (2 * num_y + 3) + (2 * center_y).astype(np.int64)
+    cells, counts = np.unique(cell, return_counts=True)
+    return (x_low + (cells // (2 * num_y + 3)) / 2.0 * step_x,
+            y_low + (cells % (2 * num_y + 3)) / 2.0 * step_y, counts)
+
+
+def centers(edges):
+    return (edges[:-1] + edges[1:]) / 2
+
+# Draw a density grid on ax (default: the current axes) as 'heatmap' or
+# 'hexbin', with the means and intervals per x bin when overlay is set
+def draw(grid, kind='heatmap', overlay=True, ax=None, cmap='viridis'):
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+    if ax is None: ax = plt.gca()
+    counts = grid['counts']
+    x_edges, y_edges = grid['x_edges'], grid['y_edges']
+    if kind == 'heatmap':
+        image = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap=cmap)
+    elif kind == 'hexbin':
+        if 'hexagons' not in grid: raise ValueError("density_grid was not made with kind='hexbin'")
+        hex_x, hex_y, hex_counts = grid['hexagons']
+        image = ax.hexbin(hex_x, hex_y, C=hex_counts, reduce_C_function=np.sum, gridsize=len(x_edges) - 1,
+                          extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+                          bins='log', cmap=cmap)
+    else:
+        raise ValueError("unknown density plot " + str(kind))
+    plt.colorbar(image, ax=ax, label='points')
+    if overlay:
+        shown = grid['column_counts'] > 1
+        means = grid['means'][shown]
+        ax.errorbar(centers(x_edges)[shown], means,
+                    yerr=[means - grid['low'][shown], grid['high'][shown] - means],
+                    fmt='o-', color='red', markersize=3, capsize=2, label='mean')
+    return image
+
+# density_grid and draw in one call, in place of plt.scatter(x, y)
+def plot(x, y, kind='heatmap', bins=100, overlay=True, ax=None):
+    return draw(density_grid(x, y, bins, kind=kind), kind, overlay, ax)
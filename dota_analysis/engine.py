@@ -0,0 +1,507 @@
+# One-pass analysis engine over the columnar match store
+#
+# Every player is read and prepared once (monthly counts, active window) and then
+# handed to a list of metric collectors, so the player statistics of
+# histo_stats.py and the inactivity results of win_ratio.py and leaver_status.py
+# come out of a single scan. Intermediate arrays that several collectors need,
+# like the inactive runs for a game_bar or the prefix-sum index of an outcome,
+# are computed once per player and shared.
+#
+# A collector has a unique name and four methods:
+#   start()                   empty overall result
+#   collect(player)           partial result of one player, or None
+#   merge(partial, overall)   fold a partial result into the overall result
+#   finish(overall)           final result
+#
+# Running all default collectors and saving the results for the scripts:
+#     python -m dota_analysis.engine <store_dir> <results_file> [timing_report.json]
+# With a third argument the run is instrumented (see instrument) and the
+# timing report is written to that file.
+
+import sys
+import os
+import pickle
+import numpy as np
+from dota_analysis import months as month_buckets
+from dota_analysis import inactivity
+from dota_analysis import backtrace as backtrace_index
+from dota_analysis import gaps
+from dota_analysis import parallel_scan
+from dota_analysis import player_cache
+from dota_analysis import player_table
+from dota_analysis import heroes
+from dota_analysis import sketch
+from dota_analysis import events as event_table
+from dota_analysis import instrument
+
+default_settings = {
+    'start_year': None, # months before start_year or from end_year on are not counted,
+    'end_year': None,   # None sizes the month window from the player's games
+    'min_games': 50,    # players with fewer games in total are ignored
+    'verbose': False,   # print the id of every player
+}
+
+def make_settings(settings=None):
+    result = dict(default_settings)
+    if settings is not None: result.update(settings)
+    return result
+
+# Everything about one player the collectors share. Return None if the player
+# is filtered out
+def prepare_player(user_id, matches, settings):
+    num_matches = len(matches['start_time'])
+    if (num_matches < settings['min_games']): return None
+    month_index = month_buckets.month_index(matches['start_time'])
+    window = month_buckets.MonthWindow.for_data(month_index, settings['start_year'],
+                                                settings['end_year'])
+    counts = window.counts(month_index)
+    player = {'user_id': user_id,
+              'matches': matches,
+              'num_matches': num_matches,
+              'month_index': month_index,
+              'window_start': window.first, # month index of counts[0]
+              'counts': counts,
+              'first': None,                # first and last position in counts
+              'last': None,                 # with at least one game
+              'shared': dict()}
+    played = month_buckets.active_range(counts)
+    if played is not None:
+        player['first'], player['last'] = played
+    return player
+
+def has_games(player):
+    return player['first'] is not None
+
+# (year, month) of a position in the player's counts
+def position_date(player, position):
+    return month_buckets.to_year_month(player['window_start'] + position)
+
+# Compute value_function() once per player and key
+def shared_value(player, key, value_function):
+    if key not in player['shared']:
+        player['shared'][key] = value_function()
+    return player['shared'][key]
+
+# Inactive runs of the player's active window for one game_bar: month index
+# where each run starts and its length
+def inactive_runs(player, game_bar):
+    def find_runs():
+        began = instrument.start()
+        first, last = player['first'], player['last']
+        starts, lengths = inactivity.inactive_runs(player['counts'][first:last + 1], game_bar)
+        instrument.stop('inactive_runs', began, last - first + 1)
+        return (player['window_start'] + first + starts, lengths)
+    return shared_value(player, ('inactive_runs', game_bar), find_runs)
+
+# Per game outcomes the ratios are computed over
+def outcome_values(matches, outcome):
+    if outcome == 'win': return matches['radiant_win']
+    if outcome == 'leave': return np.asarray(matches['leaver_status']) != 0
+    raise ValueError("unknown outcome " + str(outcome))
+
+def outcome_index(player, outcome):
+    def build():
+        began = instrument.start()
+        index = backtrace_index.build_index(player['month_index'],
+                                            outcome_values(player['matches'], outcome))
+        instrument.stop('backtrace_index', began, player['num_matches'])
+        return index
+    return shared_value(player, ('outcome_index', outcome), build)
+
+# Positions of the games inside the month window in start_time order: a slice
+# of all games when they are all inside and sorted, else an index array
+def window_order(player):
+    def select():
+        position = player['month_index'] - player['window_start']
+        inside = (position >= 0) & (position < len(player['counts']))
+        games = slice(None) if inside.all() else np.flatnonzero(inside)
+        order = gaps.sort_order(player['matches']['start_time'][games])
+        if order is None: return games
+        return np.arange(player['num_matches'])[games][order]
+    return shared_value(player, 'window_order', select)
+
+# Breaks of at least gap_days days between consecutive games of the window:
+# index in window_order of the first game after each break and its length in days
+def day_gaps(player, gap_days):
+    def find():
+        began = instrument.start()
+        start_time = player['matches']['start_time'][window_order(player)]
+        found = gaps.find_gaps(start_time, gap_days)
+        instrument.stop('day_gaps', began, len(start_time))
+        return found
+    return shared_value(player, ('day_gaps', gap_days), find)
+
+# Prefix sums of an outcome over the games in window_order
+def outcome_prefix_sums(player, outcome):
+    def build():
+        outcomes = outcome_values(player['matches'], outcome)
+        return gaps.prefix_sums(np.asarray(outcomes)[window_order(player)])
+    return shared_value(player, ('outcome_prefix_sums', outcome), build)
+
+# Overall rates of the player: win rate, leaver rate (any leaver_status but 0)
+# and hero diversity (heroes played per game)
+def player_stats(player):
+    def compute():
+        matches = player['matches']
+        num_matches = player['num_matches']
+        usage = heroes.hero_usage(matches['hero_id'])
+        return {'win_rate': float(np.count_nonzero(matches['radiant_win'])) / num_matches,
+                'leaver_rate': float(np.count_nonzero(matches['leaver_status'])) / num_matches,
+                'hero_diversity': float(np.count_nonzero(usage)) / num_matches,
+                'hero_usage': usage}
+    return shared_value(player, 'player_stats', compute)
+
+
+class Collector(object):
+    name = None
+
+    def start(self):
+        return dict()
+
+    def collect(self, player):
+        return None
+
+    def merge(self, partial, overall):
+        pass
+
+    def finish(self, overall):
+        return overall
+
+    # Identifies the collector and its parameters, e.g. for caches
+    def key(self):
+        return (type(self).__name__, tuple(sorted(vars(self).items())))
+
+
+# Overall win rate, leaver rate and hero diversity of every player (histo_stats.py)
+# Result: a player_table.PlayerTable
+class PlayerStatsCollector(Collector):
+    name = 'player_stats'
+
+    def start(self):
+        return player_table.PlayerTableBuilder()
+
+    def collect(self, player):
+        stats = player_stats(player)
+        return {'user_id': player['user_id'],
+                'num_matches': player['num_matches'],
+                'win_rate': stats['win_rate'],
+                'leaver_rate': stats['leaver_rate'],
+                'hero_diversity': stats['hero_diversity'],
+                'hero_bits': player_table.hero_row(stats['hero_usage']),
+                'window_start': player['window_start'],
+                'games_each_month': player['counts'],
+                'first': player['first'],
+                'last': player['last']}
+
+    def merge(self, partial, overall):
+        overall.append(partial)
+
+    def finish(self, overall):
+        return overall.finish()
+
+
+# Distributions of the player statistics without keeping a value per player:
+# a streaming histogram and a quantile sketch for each statistic
+# Result: dict statistic name: sketch.Distribution
+class DistributionCollector(Collector):
+    name = 'distributions'
+
+    # Fine bins, so that plots can re-bin them over the observed range (see
+    # sketch.StreamingHistogram.rebin); bins 0.4% wide for the match counts
+    def start(self):
+        return {'win_rate': sketch.Distribution(0, 1, 10000),
+                'leaver_rate': sketch.Distribution(0, 1, 10000),
+                'hero_diversity': sketch.Distribution(0, 1, 10000),
+                'num_matches': sketch.Distribution(1, 1e7, 4000, log=True)}
+
+    def collect(self, player):
+        stats = player_stats(player)
+        return {'win_rate': stats['win_rate'],
+                'leaver_rate': stats['leaver_rate'],
+                'hero_diversity': stats['hero_diversity'],
+                'num_matches': player['num_matches']}
+
+    def merge(self, partial, overall):
+        for name in partial:
+            overall[name].add(partial[name])
+
+    def finish(self, overall):
+        for name in overall:
+            overall[name].flush()
+        return overall
+
+
+# Pick count, win rate and leaver rate of every hero over all players
+# Result: dict of per-hero arrays, see heroes.hero_stats
+class HeroStatsCollector(Collector):
+    name = 'hero_stats'
+
+    def start(self):
+        return [np.zeros(heroes.num_heroes) for _ in range(3)]
+
+    def collect(self, player):
+        return heroes.player_hero_totals(player['matches'])
+
+    def merge(self, partial, overall):
+        for total, value in zip(overall, partial):
+            total += value
+
+    def finish(self, overall):
+        picks, wins, leaves = overall
+        return heroes.hero_stats(picks, wins, leaves)
+
+
+# Length of every inactive period and the ratio of the outcome over the last
+# `backtrace` games before it, divided by the player's overall rate.
+# Result: a dict from the length of the inactive period to the list of ratios
+class InactivityCollector(Collector):
+    outcome = None
+
+    def __init__(self, game_bar=5, backtrace=5, normalize=True, name=None):
+        self.game_bar = game_bar   # fewer games than this in a month is inactive
+        self.backtrace = backtrace # number of games tracked before an inactive period
+        self.normalize = normalize # divide the ratios by the overall rate
+        if name is None: name = 'inactive_' + self.outcome
+        self.name = name
+
+    # Share of all the player's matches with the outcome
+    def overall_rate(self, player):
+        positives = np.count_nonzero(outcome_values(player['matches'], self.outcome))
+        return float(positives) / player['num_matches']
+
+    # Inactive periods of one player that have games to backtrace, as arrays:
+    # month index where the period starts, its length, the number of games the
+    # ratio is over, the ratio and the ratio divided by the overall rate (nan
+    # when the overall rate is 0)
+    def player_events(self, player):
+        events = {'start_month': np.zeros(0, dtype=np.int64),
+                  'period': np.zeros(0, dtype=np.int64),
+                  'games': np.zeros(0, dtype=np.int64),
+                  'ratio': np.zeros(0),
+                  'normalized': np.zeros(0)}
+        if not has_games(player): return events
+        starts, lengths = inactive_runs(player, self.game_bar)
+        # games after the first active month, up to the month the inactive period starts
+        first_month = player['window_start'] + player['first']
+        index = outcome_index(player, self.outcome)
+        began = instrument.start()
+        positives, num_games = backtrace_index.backtrace_window(index, first_month, starts, self.backtrace)
+        instrument.stop('backtrace', began, len(starts))
+        found = num_games > 0
+        ratios = positives[found] / num_games[found]
+        rate = self.overall_rate(player)
+        events['start_month'] = np.asarray(starts)[found]
+        events['period'] = lengths[found]
+        events['games'] = num_games[found]
+        events['ratio'] = ratios
+        events['normalized'] = ratios / rate if rate != 0 else np.full(len(ratios), np.nan)
+        return events
+
+    # Ratios of one player, grouped by the length of the inactive period
+    def player_ratios(self, player):
+        if self.normalize and has_games(player) and self.overall_rate(player) == 0:
+            return dict() # nothing to compare the ratios with
+        events = self.player_events(player)
+        ratios = events['normalized'] if self.normalize else events['ratio']
+        result = dict()
+        for period, ratio in zip(events['period'].tolist(), ratios.tolist()):
+            if period not in result: result[period] = []
+            result[period].append(ratio)
+        return result
+
+    def collect(self, player):
+        return self.player_ratios(player)
+
+    def merge(self, partial, overall):
+        for period in partial:
+            if period in overall: overall[period].extend(partial[period])
+            else: overall[period] = list(partial[period])
+
+
+# Win ratio before inactive periods, every event counts once (win_ratio.py)
+class InactiveWinCollector(InactivityCollector):
+    outcome = 'win'
+
+
+# Leave rate before inactive periods, averaged per player and period length
+# first (leaver_status.py). The overall rate only counts leaver_status 1
+class InactiveLeaveCollector(InactivityCollector):
+    outcome = 'leave'
+
+    def overall_rate(self, player):
+        leaves = np.count_nonzero(np.asarray(player['matches']['leaver_status']) == 1)
+        return float(leaves) / player['num_matches']
+
+    def collect(self, player):
+        result = self.player_ratios(player)
+        for period in result:
+            result[period] = np.array(result[period]).mean()
+        return result
+
+    def merge(self, partial, overall):
+        for period in partial:
+            if period in overall: overall[period].append(partial[period])
+            else: overall[period] = [partial[period]]
+
+
+# Day resolution instead of calendar months: an inactive period is a break of
+# at least gap_days days between two consecutive games, its length is counted
+# in days and the ratio is over the last `backtrace` games before the break,
+# found by index (see gaps). Mixed into the win and leave collectors, which
+# keep their overall rates and results
+class DayGapMode(object):
+    def __init__(self, gap_days=30, backtrace=5, normalize=True, name=None):
+        self.gap_days = gap_days   # a break of at least this many days is inactive
+        self.backtrace = backtrace # number of games tracked before a break
+        self.normalize = normalize # divide the ratios by the overall rate
+        if name is None: name = 'gaps_' + self.outcome
+        self.name = name
+
+    # Same arrays as InactivityCollector.player_events; start_month is the
+    # month of the last game before the break and period its length in days
+    def player_events(self, player):
+        after, lengths = day_gaps(player, self.gap_days)
+        cumulative = outcome_prefix_sums(player, self.outcome)
+        began = instrument.start()
+        positives, num_games = gaps.games_before(cumulative, after, self.backtrace)
+        instrument.stop('backtrace', began, len(after))
+        ratios = positives / num_games
+        rate = self.overall_rate(player)
+        month_index = player['month_index'][window_order(player)]
+        return {'start_month': month_index[after - 1],
+                'period': lengths,
+                'games': num_games,
+                'ratio': ratios,
+                'normalized': ratios / rate if rate != 0 else np.full(len(ratios), np.nan)}
+
+
+class DayGapWinCollector(DayGapMode, InactiveWinCollector):
+    pass
+
+
+class DayGapLeaveCollector(DayGapMode, InactiveLeaveCollector):
+    pass
+
+
+# Every inactivity event of an inactivity collector, with its player and month
+# Result: an events.EventTable; ratio_lists() is the result of the collector
+# itself, player_mean_lists() the one of InactiveLeaveCollector
+class EventCollector(Collector):
+    def __init__(self, inactivity_collector, name=None):
+        self.inactivity_collector = inactivity_collector
+        if name is None: name = 'events_' + inactivity_collector.name
+        self.name = name
+
+    def start(self):
+        return event_table.EventTableBuilder()
+
+    def collect(self, player):
+        events = self.inactivity_collector.player_events(player)
+        if len(events['period']) == 0: return None
+        events['user_id'] = player['user_id']
+        return events
+
+    def merge(self, partial, overall):
+        overall.append(partial)
+
+    def finish(self, overall):
+        return overall.finish()
+
+    def key(self):
+        return (type(self).__name__, self.name, self.inactivity_collector.key())
+
+
+def default_collectors():
+    return [PlayerStatsCollector(), DistributionCollector(), HeroStatsCollector(),
+            EventCollector(InactiveWinCollector()), EventCollector(InactiveLeaveCollector())]
+
+
+# Runs every collector on one player; this is what the worker processes call
+class PlayerAnalyzer(object):
+    def __init__(self, collectors, settings=None):
+        self.collectors = list(collectors)
+        self.settings = make_settings(settings)
+        names = [collector.name for collector in self.collectors]
+        if len(set(names)) != len(names):
+            raise ValueError("collector names must be unique: " + str(names))
+
+    def __call__(self, user_id, matches):
+        if self.settings['verbose']: print(user_id)
+        began = instrument.start()
+        player = prepare_player(user_id, matches, self.settings)
+        instrument.stop('prepare', began, len(matches['start_time']))
+        if player is None: return None
+        partials = dict()
+        for collector in self.collectors:
+            began = instrument.start()
+            partial = collector.collect(player)
+            instrument.stop('collect ' + collector.name, began)
+            if partial is not None: partials[collector.name] = partial
+        return partials
+
+    def start(self):
+        return dict((collector.name, collector.start()) for collector in self.collectors)
+
+    def merge(self, partials, overall):
+        began = instrument.start()
+        for collector in self.collectors:
+            if collector.name in partials:
+                collector.merge(partials[collector.name], overall[collector.name])
+        instrument.stop('merge', began)
+
+    def finish(self, overall):
+        began = instrument.start()
+        results = dict((collector.name, collector.finish(overall[collector.name]))
+                       for collector in self.collectors)
+        instrument.stop('finish', began)
+        return results
+
+    # Everything the results depend on
+    def key(self):
+        settings = [item for item in sorted(self.settings.items()) if item[0] != 'verbose']
+        return (tuple(settings), tuple(collector.key() for collector in self.collectors))
+
+
+# Scan the store once and return a dict collector name: result
+def run(store_path, collectors, settings=None, processes=None):
+    analyzer = PlayerAnalyzer(collectors, settings)
+    overall = parallel_scan.scan_players(store_path, analyzer, analyzer.merge,
+                                         analyzer.start(), processes)
+    return analyzer.finish(overall)
+
+# Same as run, reading the json files and only analyzing new or changed players
+def run_cached(json_dir, cache_path, collectors, settings=None):
+    analyzer = PlayerAnalyzer(collectors, settings)
+    overall, num_changed, num_files = player_cache.scan_cached(json_dir, cache_path, analyzer, analyzer.merge,
+                                                               analyzer.start(), analyzer.key())
+    if analyzer.settings['verbose']:
+        print("Analyzed " + str(num_changed) + " new or changed of " + str(num_files) + " player files")
+    return analyzer.finish(overall)
+
+def save_results(file_name, results, collectors, settings=None):
+    analyzer = PlayerAnalyzer(collectors, settings)
+    with open(file_name, 'wb') as fh:
+        pickle.dump({'key': analyzer.key(), 'results': results}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+
+# Results saved by save_results for one collector. Return None if there is no
+# results file or it was computed with other settings
+def load_result(file_name, collector, settings=None):
+    if not os.path.exists(file_name): return None
+    with open(file_name, 'rb') as fh:
+        saved = pickle.load(fh)
+    saved_settings, saved_collectors = saved['key']
+    if saved_settings != PlayerAnalyzer([], settings).key()[0]: return None
+    if collector.key() not in saved_collectors: return None
+    return saved['results'][collector.name]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print("usage: python -m dota_analysis.engine <store_dir> <results_file> [timing_report.json]")
+        sys.exit(1)
+    if len(sys.argv) == 4: instrument.enable()
+    collectors = default_collectors()
+    results = run(sys.argv[1], collectors)
+    save_results(sys.argv[2], results, collectors)
+    if len(sys.argv) == 4: instrument.write_report(sys.argv[3])
@@ -0,0 +1,164 @@
+# Flat table of inactivity events
+#
+# Every inactive period found by an inactivity collector of the engine is one
+# row, with one NumPy column per field:
+#   player       int32    row of the player in player_ids
+#   start_month  int32    month index the inactive period starts in
+#   period       int16    length of the inactive period in months (days for the
+#                         day gap collectors)
+#   games        int16    number of games the ratio is over (at most backtrace)
+#   ratio        float64  win or leave ratio over those games
+#   normalized   float64  ratio divided by the player's overall rate, nan if it is 0
+#   player_ids   str      user id of every player with events
+# Rows are in the order the players were analyzed, and in time order for each
+# player. Averages per period, filters and plots are array operations on the
+# columns instead of loops over dicts of lists. The table is saved as one .npz
+# file, or as a directory of .npy files that is memory-mapped when loaded.
+
+import os
+import numpy as np
+from dota_analysis import months as month_buckets
+
+column_types = [('player', np.int32),
+                ('start_month', np.int32),
+                ('period', np.int16),
+                ('games', np.int16),
+                ('ratio', np.float64),
+                ('normalized', np.float64)]
+column_names = [name for name, dtype in column_types]
+
+
+class EventTable(object):
+    def __init__(self, columns, player_ids):
+        for name in column_names:
+            setattr(self, name, columns[name])
+        self.player_ids = player_ids
+
+    def __len__(self):
+        return len(self.period)
+
+    def columns(self):
+        return dict((name, getattr(self, name)) for name in column_names)
+
+    # Rows where mask is true, e.g. table.select(table.games == backtrace)
+    def select(self, mask):
+        columns = dict((name, column[mask]) for name, column in self.columns().items())
+        return EventTable(columns, self.player_ids)
+
+    # User id of every row
+    def user_ids(self):
+        return self.player_ids[self.player]
+
+    # (year, month) the inactive period of a row starts in
+    def start_date(self, i):
+        return month_buckets.to_year_month(int(self.start_month[i]))
+
+    # ratio or normalized ratio; rows with nan are left out
+    def values(self, column):
+        values = getattr(self, column)
+        keep = ~np.isnan(values)
+        return values[keep], self.period[keep]
+
+    # Mean of a column for every period length: (periods, means, counts)
+    def period_means(self, column='normalized'):
+        values, periods = self.values(column)
+        counts = np.bincount(periods)
+        sums = np.bincount(periods, weights=values)
+        periods = np.flatnonzero(counts)
+        return periods, sums[periods] / counts[periods], counts[periods]
+
+    # Mean of a column for every player and period length, ordered by player:
+    # (players, periods, means)
+    def player_period_means(self, column='normalized'):
+        values = getattr(self, column)
+        keep = ~np.isnan(values)
+        periods = self.period[keep].astype(np.int64)
+        num_periods = int(periods.max(initial=0)) + 1
+        # int64 keys, player row x period length overflows int32 in day gap mode
+        keys, groups = np.unique(self.player[keep].astype(np.int64) * num_periods + periods,
+                                 return_inverse=True)
+        means = np.bincount(groups, weights=values[keep]) / np.bincount(groups)
+        return keys // num_periods, keys % num_periods, means
+
+    # The old dict of lists: period length: list of the column's values
+    def ratio_lists(self, column='normalized'):
+        values, periods = self.values(column)
+        return group_lists(periods, values)
+
+    # period length: list of the per-player means of the column
+    def player_mean_lists(self, column='normalized'):
+        players, periods, means = self.player_period_means(column)
+        return group_lists(periods, means)
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in column_names)
+
+    # A path ending in .npz is saved as a single file, anything else as a
+    # directory with one .npy file per column
+    def save(self, path):
+        columns = self.columns()
+        if path.endswith('.npz'):
+            np.savez(path, player_ids=self.player_ids, **columns)
+            return
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'player_ids.npy'), self.player_ids)
+        for name in columns:
+            np.save(os.path.join(path, name + '.npy'), columns[name])
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        if path.endswith('.npz'):
+            with np.load(path) as saved:
+                columns = dict((name, saved[name]) for name in column_names)
+                player_ids = saved['player_ids']
+            return cls(columns, player_ids)
+        columns = dict()
+        for name in column_names:
+            columns[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+        return cls(columns, np.load(os.path.join(path, 'player_ids.npy')))
+
+
+# dict key: list of the values with that key, keeping the order of the values
+def group_lists(keys, values):
+    order = np.argsort(keys, kind='stable')
+    keys, values = np.asarray(keys)[order], np.asarray(values)[order]
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    result = dict()
+    for group_keys, group_values in zip(np.split(keys, bounds), np.split(values, bounds)):
+        if len(group_keys): result[int(group_keys[0])] = group_values.tolist()
+    return result
+
+
+# Collects the events of one player at a time into growing arrays and makes
+# the table at the end
+class EventTableBuilder(object):
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self.player_ids = list()
+        self.capacity = capacity
+        self.columns = dict((name, np.zeros(capacity, dtype=dtype)) for name, dtype in column_types)
+
+    def grow(self, capacity):
+        for name in self.columns:
+            column = np.zeros(capacity, dtype=self.columns[name].dtype)
+            column[:self.size] = self.columns[name][:self.size]
+            self.columns[name] = column
+        self.capacity = capacity
+
+    # events: dict of arrays with user_id and the columns but player, see
+    # engine.InactivityCollector.player_events
+    def append(self, events):
+        count = len(events['period'])
+        if count == 0: return
+        if self.size + count > self.capacity:
+            self.grow(max(2 * self.capacity, self.size + count))
+        begin, end = self.size, self.size + count
+        self.columns['player'][begin:end] = len(self.player_ids)
+        self.player_ids.append(events['user_id'])
+        for name in column_names[1:]:
+            self.columns[name][begin:end] = events[name]
+        self.size = end
+
+    def finish(self):
+        columns = dict((name, self.columns[name][:self.size].copy()) for name in self.columns)
+        return EventTable(columns, np.array(self.player_ids, dtype=str))
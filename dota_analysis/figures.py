@@ -0,0 +1,115 @@
+# Report figures, shown on screen or written to files without a display
+#
+# A figure is a dict that says what to draw: its name (the file name without
+# extension), kind ('histogram' or 'scatter'), title and axis labels, and the
+# data. The scripts build their figures as dicts and either show them one by one
+# with show_all, or hand them to render_all, which draws them with the
+# non-interactive Agg backend in a process pool and saves every figure as PNG
+# and/or SVG. render_all also writes manifest.json to the output directory,
+# listing every figure with its files, so scheduled jobs never wait for a window
+# to be closed.
+
+import os
+import json
+import time
+import multiprocessing
+import numpy as np
+from dota_analysis import density
+
+manifest_name = 'manifest.json'
+
+# Histogram from precomputed bin edges and counts
+def histogram_figure(name, title, edges, counts, xlabel=None, ylabel=None):
+    return {'name': name, 'kind': 'histogram', 'title': title, 'xlabel': xlabel, 'ylabel': ylabel,
+            'edges': np.asarray(edges), 'counts': np.asarray(counts)}
+
+# Scatter plot of x against y; mode 'heatmap' or 'hexbin' draws a density grid
+# of bins x bins cells instead (see density)
+def scatter_figure(name, title, x, y, xlabel=None, ylabel=None, mode='scatter', bins=100, overlay=True):
+    return {'name': name, 'kind': 'scatter', 'title': title, 'xlabel': xlabel, 'ylabel': ylabel,
+            'x': np.asarray(x), 'y': np.asarray(y), 'mode': mode, 'bins': bins, 'overlay': overlay}
+
+# Number of points the figure shows
+def num_points(figure):
+    if figure['kind'] == 'histogram': return int(np.sum(figure['counts']))
+    return len(figure['x'])
+
+# Draw the figure on the current matplotlib figure
+def draw_figure(figure):
+    import matplotlib.pyplot as plt
+    if figure['kind'] == 'histogram':
+        edges = figure['edges']
+        plt.hist(edges[:-1], bins = edges, weights = figure['counts'])
+    elif figure['kind'] == 'scatter':
+        if figure['mode'] == 'scatter': plt.scatter(figure['x'], figure['y'])
+        else: density.plot(figure['x'], figure['y'], figure['mode'], figure['bins'], figure['overlay'])
+    else:
+        raise ValueError("unknown figure kind " + str(figure['kind']))
+    if figure['title'] is not None: plt.title(figure['title'])
+    if figure['xlabel'] is not None: plt.xlabel(figure['xlabel'])
+    if figure['ylabel'] is not None: plt.ylabel(figure['ylabel'])
+
+# Show the figures one after another, each until its window is closed
+def show_all(figures):
+    import matplotlib.pyplot as plt
+    for figure in figures:
+        plt.figure()
+        draw_figure(figure)
+        plt.show()
+
+def use_file_backend():
+    import matplotlib
+    matplotlib.use('Agg')
+
+# Draw one figure and save it in every format; return its manifest entry
+def render(figure, out_dir, formats):
+    import matplotlib.pyplot as plt
+    began = time.perf_counter()
+    fig = plt.figure()
+    try:
+        draw_figure(figure)
+        files = list()
+        for file_format in formats:
+            file_name = figure['name'] + '.' + file_format
+            fig.savefig(os.path.join(out_dir, file_name), format=file_format)
+            files.append(file_name)
+    finally:
+        plt.close(fig)
+    return {'name': figure['name'], 'kind': figure['kind'], 'title': figure['title'],
+            'points': num_points(figure), 'files': files,
+            'seconds': round(time.perf_counter() - began, 3)}
+
+def render_task(task):
+    return render(*task)
+
+# Render all figures into out_dir in a process pool (processes=None uses every
+# core, 1 renders in this process) and write the manifest; return it
+def render_all(figures, out_dir, formats=('png',), processes=None):
+    os.makedirs(out_dir, exist_ok=True)
+    began = time.perf_counter()
+    tasks = [(figure, out_dir, list(formats)) for figure in figures]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if processes <= 1:
+        use_file_backend()
+        entries = [render_task(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(processes, use_file_backend) as pool:
+            entries = pool.map(render_task, tasks, chunksize=1)
+    manifest = {'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'seconds': round(time.perf_counter() - began, 3),
+                'figures': entries}
+    manifest_path = os.path.join(out_dir, manifest_name)
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+# Show the figures, or render them into out_dir when it is set
+def show_or_save(figures, out_dir=None, formats=('png',), processes=None):
+    if out_dir is None:
+        show_all(figures)
+        return None
+    manifest = render_all(figures, out_dir, formats, processes)
+    print("Wrote " + str(len(manifest['figures'])) + " figures to " + out_dir
+          + " in " + str(manifest['seconds']) + " seconds")
+    return manifest
@@ -0,0 +1,74 @@
+# Breaks between games at day resolution
+#
+# Instead of counting games per calendar month, a break is any gap of at least
+# min_days days between two consecutive games, found with one diff over the
+# sorted start_time array. The games before a break are the ones before its
+# index, so the ratio over the last N games is a difference of two prefix sums.
+# find_store_gaps does the same over the whole start_time column of the store
+# at once, masking out the gaps between one player's last and the next
+# player's first game.
+#
+#     python -m dota_analysis.gaps <store_dir> [min_days]
+# counts the breaks of every player of a columnar store and prints the rate.
+
+import sys
+import time
+import numpy as np
+
+seconds_per_day = 86400
+
+# Index of the first game after every break of at least min_days between
+# consecutive games, and the length of the break in whole days.
+# start_time must be sorted
+def find_gaps(start_time, min_days):
+    start_time = np.asarray(start_time, dtype=np.int64)
+    gaps = np.diff(start_time)
+    after = np.flatnonzero(gaps >= min_days * seconds_per_day) + 1
+    return after, gaps[after - 1] // seconds_per_day
+
+# None if start_time is sorted, else the order that sorts it
+def sort_order(start_time):
+    start_time = np.asarray(start_time)
+    if len(start_time) < 2 or np.all(start_time[1:] >= start_time[:-1]): return None
+    return np.argsort(start_time, kind='stable')
+
+# cumulative[i] is the number of positive outcomes in the first i games
+def prefix_sums(outcomes):
+    return np.concatenate(([0], np.cumsum(np.asarray(outcomes, dtype=np.int64))))
+
+# Positive outcomes and number of games among the last `backtrace` games
+# before game index `end` (fewer when there are fewer games before it)
+def games_before(cumulative, end, backtrace):
+    num_games = np.minimum(end, backtrace)
+    return cumulative[end] - cumulative[end - num_games], num_games
+
+# Breaks of every player of the store in one pass: the player row, the index of
+# the first game after the break within the player's games and the length in
+# days. The start_time column must be sorted within every player
+def find_store_gaps(start_time, offsets, min_days):
+    start_time = np.asarray(start_time, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    gaps = np.diff(start_time)
+    is_break = gaps >= min_days * seconds_per_day
+    # the diff between the last game of a player and the first of the next
+    boundaries = offsets[1:-1] - 1
+    is_break[boundaries[(boundaries >= 0) & (boundaries < len(gaps))]] = False
+    after = np.flatnonzero(is_break) + 1
+    rows = np.searchsorted(offsets, after, side='right') - 1
+    return rows, after - offsets[rows], gaps[after - 1] // seconds_per_day
+
+
+if __name__ == '__main__':
+    from dota_analysis import match_store
+    if len(sys.argv) not in (2, 3):
+        print("usage: python -m dota_analysis.gaps <store_dir> [min_days]")
+        sys.exit(1)
+    min_days = float(sys.argv[2]) if len(sys.argv) == 3 else 30
+    store = match_store.load_store(sys.argv[1])
+    start_time = np.asarray(store['start_time'])
+    begin = time.perf_counter()
+    rows, after, lengths = find_store_gaps(start_time, store['offsets'], min_days)
+    seconds = time.perf_counter() - begin
+    print(str(len(rows)) + " breaks of at least " + str(min_days) + " days in "
+          + str(len(start_time)) + " matches, "
+          + str(int(len(start_time) / max(seconds, 1e-9))) + " matches/sec")
@@ -0,0 +1,76 @@
+# Hero usage counts built with bincount from the hero_id column
+#
+# The usage of a player is a vector with the number of games played with every
+# hero, so the hero diversity is the number of nonzero entries. For the whole
+# store the same is done as one players x heroes matrix, and the per-hero pick
+# counts, win rates and leaver rates of the corpus are weighted bincounts.
+#
+#     python -m dota_analysis.heroes <store_dir>
+# prints the pick count, win rate and leaver rate of every hero in the store.
+
+import sys
+import numpy as np
+from dota_analysis import match_store
+
+num_heroes = 256 # hero ids must be below this
+
+def check_hero_ids(hero_ids):
+    if len(hero_ids) and (hero_ids.min() < 0 or hero_ids.max() >= num_heroes):
+        raise ValueError("hero id out of range 0-" + str(num_heroes - 1))
+
+# Number of games with each hero; with weights, the sum of the weights instead
+def hero_usage(hero_ids, weights=None):
+    hero_ids = np.asarray(hero_ids, dtype=np.int64)
+    check_hero_ids(hero_ids)
+    return np.bincount(hero_ids, weights=weights, minlength=num_heroes)
+
+def hero_diversity(usage, num_matches):
+    return np.count_nonzero(usage, axis=-1) / np.asarray(num_matches, dtype=np.float64)
+
+# Games with each hero for every player of the store: a players x heroes
+# int32 matrix, scattered with one bincount per block of players
+def usage_matrix(store, block_size=65536):
+    offsets = np.asarray(store['offsets'])
+    num_players = len(offsets) - 1
+    matrix = np.zeros((num_players, num_heroes), dtype=np.int32)
+    for begin in range(0, num_players, block_size):
+        end = min(begin + block_size, num_players)
+        hero_ids = np.asarray(store['hero_id'][offsets[begin]:offsets[end]], dtype=np.int64)
+        check_hero_ids(hero_ids)
+        rows = np.repeat(np.arange(end - begin), np.diff(offsets[begin:end + 1]))
+        counts = np.bincount(rows * num_heroes + hero_ids, minlength=(end - begin) * num_heroes)
+        matrix[begin:end] = counts.reshape(end - begin, num_heroes)
+    return matrix
+
+# Pick count, win rate and leaver rate of every hero (nan for heroes never picked)
+def hero_stats(picks, wins, leaves):
+    picks = np.asarray(picks, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = np.where(picks > 0, wins / picks, np.nan)
+        leaver_rate = np.where(picks > 0, leaves / picks, np.nan)
+    return {'picks': picks.astype(np.int64), 'win_rate': win_rate, 'leaver_rate': leaver_rate}
+
+# Totals of one player, summed over players by the engine's HeroStatsCollector
+def player_hero_totals(matches):
+    hero_ids = matches['hero_id']
+    return (hero_usage(hero_ids),
+            hero_usage(hero_ids, np.asarray(matches['radiant_win'], dtype=np.float64)),
+            hero_usage(hero_ids, (np.asarray(matches['leaver_status']) != 0).astype(np.float64)))
+
+# Per-hero statistics over every match in the store
+def store_hero_stats(store):
+    hero_ids = store['hero_id']
+    return hero_stats(hero_usage(hero_ids),
+                      hero_usage(hero_ids, np.asarray(store['radiant_win'], dtype=np.float64)),
+                      hero_usage(hero_ids, (np.asarray(store['leaver_status']) != 0).astype(np.float64)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python -m dota_analysis.heroes <store_dir>")
+        sys.exit(1)
+    stats = store_hero_stats(match_store.load_store(sys.argv[1]))
+    print("hero  picks  win rate  leaver rate")
+    for hero_id in np.flatnonzero(stats['picks']):
+        print("%4d %6d %9.4f %12.4f" % (hero_id, stats['picks'][hero_id],
+                                        stats['win_rate'][hero_id], stats['leaver_rate'][hero_id]))
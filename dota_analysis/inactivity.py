@@ -0,0 +1,48 @@
+# Inactive period detection over dense month count arrays
+#
+# A month is inactive when fewer than game_bar games were played in it, and an
+# inactive period is a run of at least two consecutive inactive months between
+# the first and the last month in which the player played at all. Runs are found
+# with run-length encoding (diff + flatnonzero) instead of visiting every month.
+
+import numpy as np
+
+min_inactive_months = 2 # shortest run of inactive months counted as a period
+
+# Find the inactive runs of one player's month counts, which must already be cut
+# to the active window. Return the start index and the length of every run
+def inactive_runs(counts, game_bar, min_length=min_inactive_months):
+    inactive = np.asarray(counts) < game_bar
+    edges = np.diff(np.concatenate(([False], inactive, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    keep = lengths >= min_length
+    return starts[keep], lengths[keep]
+
+# First and last month with at least one game in every row of a players x months
+# matrix, and whether the row has any game at all
+def active_window(counts):
+    played = np.asarray(counts) > 0
+    has_games = played.any(axis=1)
+    first = np.argmax(played, axis=1)
+    last = played.shape[1] - 1 - np.argmax(played[:, ::-1], axis=1)
+    return first, last, has_games
+
+# Batched version of inactive_runs for a players x months matrix. Every row is
+# cut to its own active window. Return the row, start column and length of every
+# run, ordered by row and then by start
+def inactive_runs_matrix(counts, game_bar, min_length=min_inactive_months):
+    counts = np.asarray(counts)
+    first, last, has_games = active_window(counts)
+    columns = np.arange(counts.shape[1])
+    in_window = ((columns >= first[:, None]) & (columns <= last[:, None])
+                 & has_games[:, None])
+    inactive = (counts < game_bar) & in_window
+    # a False column on each side keeps runs from joining across rows
+    padding = np.zeros((counts.shape[0], 1), dtype=bool)
+    edges = np.diff(np.hstack((padding, inactive, padding)).astype(np.int8), axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    lengths = ends - starts
+    keep = lengths >= min_length
+    return rows[keep], starts[keep], lengths[keep]
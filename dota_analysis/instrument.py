@@ -0,0 +1,133 @@
+# Per-stage timing and counters of the analysis pipeline
+#
+# Off by default. When enabled, every stage (reading a player's data, decoding
+# json, monthly bucketing, inactive runs, backtrace ratios, each collector, ...)
+# adds its wall time, call count, records and bytes to a total for the stage and
+# to the player being analyzed. Only the slowest players and the largest files
+# are kept, so the memory used does not grow with the corpus.
+#
+#     began = instrument.start()
+#     ...
+#     instrument.stop('decode', began, records=len(matches), nbytes=len(data))
+# start() returns None while disabled and stop() then returns at once, so the
+# calls cost next to nothing in normal runs.
+#
+# Stages may be nested (a collector's stage includes the inactive runs it
+# needs), so the seconds of the stages do not add up to the wall time; the
+# time of a player is the wall time from begin_player to end_player.
+#
+# Worker processes hand their counters back with take() and the parent adds
+# them up with merge(). write_report saves everything as json.
+
+import time
+import heapq
+import json
+
+enabled = False
+top_n = 20 # slowest players and largest files listed in the report
+
+# stage name: [seconds, calls, records, bytes]
+totals = dict()
+current = None # the player being analyzed
+players = 0
+slowest = list() # heaps of (key, order, player), smallest key first
+largest = list()
+began_at = None
+order = 0
+
+def enable(flag=True):
+    global enabled, began_at
+    enabled = flag
+    if flag: began_at = time.perf_counter()
+
+def reset():
+    global totals, current, players, slowest, largest
+    totals = dict()
+    current = None
+    players = 0
+    slowest = list()
+    largest = list()
+
+def start():
+    if not enabled: return None
+    return time.perf_counter()
+
+def stop(stage, began, records=0, nbytes=0):
+    if began is None: return
+    seconds = time.perf_counter() - began
+    add(totals, stage, seconds, 1, records, nbytes)
+    if current is not None:
+        add(current['stages'], stage, seconds, 1, records, nbytes)
+        current['bytes'] += nbytes
+
+def add(counters, stage, seconds, calls, records, nbytes):
+    if stage not in counters: counters[stage] = [0.0, 0, 0, 0]
+    total = counters[stage]
+    total[0] += seconds
+    total[1] += calls
+    total[2] += records
+    total[3] += nbytes
+
+# Stages from here to end_player() are also counted for this player
+def begin_player(user_id, file_path=None):
+    global current
+    if not enabled: return
+    current = {'user_id': user_id, 'file': file_path, 'began': time.perf_counter(),
+               'seconds': 0.0, 'bytes': 0, 'stages': dict()}
+
+def end_player():
+    global current, players
+    if current is None: return
+    current['seconds'] = time.perf_counter() - current.pop('began')
+    players += 1
+    keep(slowest, current['seconds'], current)
+    keep(largest, current['bytes'], current)
+    current = None
+
+def keep(heap, key, player):
+    global order
+    order += 1
+    if len(heap) < top_n: heapq.heappush(heap, (key, order, player))
+    else: heapq.heappushpop(heap, (key, order, player))
+
+# Counters gathered since the last take(), for merge() in another process
+def take():
+    if not enabled: return None
+    state = {'totals': totals, 'players': players,
+             'slowest': [entry[2] for entry in slowest],
+             'largest': [entry[2] for entry in largest]}
+    reset()
+    return state
+
+def merge(state):
+    global players
+    if state is None: return
+    for stage in state['totals']:
+        add(totals, stage, *state['totals'][stage])
+    players += state['players']
+    for player in state['slowest']:
+        keep(slowest, player['seconds'], player)
+    for player in state['largest']:
+        keep(largest, player['bytes'], player)
+
+def player_report(player):
+    return {'user_id': player['user_id'], 'file': player['file'],
+            'seconds': player['seconds'], 'bytes': player['bytes'],
+            'stages': dict((stage, player['stages'][stage][0]) for stage in player['stages'])}
+
+def report():
+    stages = list()
+    for stage in sorted(totals, key=lambda stage: -totals[stage][0]):
+        seconds, calls, records, nbytes = totals[stage]
+        stages.append({'stage': stage, 'seconds': seconds, 'calls': calls,
+                       'records': records, 'bytes': nbytes,
+                       'records_per_sec': records / seconds if records and seconds > 0 else None})
+    return {'wall_seconds': None if began_at is None else time.perf_counter() - began_at,
+            'players': players,
+            'stages': stages,
+            'slowest_players': [player_report(entry[2]) for entry in sorted(slowest, reverse=True)],
+            'largest_files': [player_report(entry[2]) for entry in sorted(largest, reverse=True)]}
+
+def write_report(file_name):
+    with open(file_name, 'w') as report_file:
+        json.dump(report(), report_file, indent=2)
@@ -0,0 +1,158 @@
+# Columnar on-disk store for the split_player_* json corpus
+#
+# Converting the corpus once with
+#     python -m dota_analysis.match_store <json_dir> <store_dir>
+# turns every *_allmatches.json file (plain, .gz or .zst, see compression) into
+# typed NumPy arrays. The analysis scripts then memory-map these arrays instead
+# of calling json.load on every run. Only the fields below are decoded, with the
+# fastest installed json backend (see decoders).
+#
+# Layout of <store_dir>:
+#   start_time.npy     int64   match start time in unix seconds
+#   radiant_win.npy    bool
+#   leaver_status.npy  int8    0 where the field is missing
+#   hero_id.npy        int16
+#   player_slot.npy    uint8
+#   player_ids.npy     str     user id of every player file
+#   offsets.npy        int64   matches of player i are [offsets[i], offsets[i+1])
+# Matches of each player are kept in chronological order (the json files list
+# the most recent match first).
+
+import sys
+import os
+import time
+import numpy as np
+from dota_analysis import decoders
+from dota_analysis import compression
+from dota_analysis import instrument
+from dota_analysis import prefetch
+
+# (field name, dtype, value used when the field is missing). Matches without a
+# start_time cannot be placed in time and are left out; a missing
+# leaver_status counts as not leaving, like leaver_status 0
+COLUMNS = [('start_time', np.int64, None),
+           ('radiant_win', np.bool_, False),
+           ('leaver_status', np.int8, 0),
+           ('hero_id', np.int16, 0),
+           ('player_slot', np.uint8, 0)]
+
+# The user id is the part of the file name before the first underscore
+def player_id_from_name(name):
+    return name.split("_")[0]
+
+# Decode only the fields in COLUMNS of a player file (see decoders for the backends)
+def read_player_columns(file_path, backend=None):
+    began = instrument.start()
+    data = compression.read_player_bytes(file_path)
+    instrument.stop('read', began, nbytes=len(data))
+    return decode_player_columns(data, backend)
+
+# Same for the content of a player file that was already read (see prefetch)
+def decode_player_columns(data, backend=None):
+    began = instrument.start()
+    play_data = decoders.decode_matches(data, backend)
+    instrument.stop('decode', began, len(play_data), len(data))
+    began = instrument.start()
+    columns = matches_to_columns(play_data)
+    instrument.stop('columns', began, len(play_data))
+    return columns
+
+# Find all player files under the directory, in the order os.walk visits them.
+# Plain and compressed files can be mixed (see compression); a player file
+# that is there both plain and compressed is only listed compressed
+def list_player_files(path):
+    player_files = []
+    for root, dirs, files in os.walk(path):
+        chosen = dict()
+        for name in files:
+            if not compression.is_player_file(name): continue
+            plain = compression.plain_name(name)
+            if chosen.get(plain, plain) == plain: chosen[plain] = name
+        for name in chosen.values():
+            player_files.append(os.path.join(root, name))
+    return player_files
+
+# Turn one player's list of match dicts into one array per column,
+# ordered chronologically. Every field is looked up once per match, which
+# keeps the lazy simdjson documents from decoding anything else
+def matches_to_columns(play_data):
+    start_times = [match.get('start_time') for match in play_data]
+    if None in start_times:
+        play_data = [match for match, start_time in zip(play_data, start_times) if start_time is not None]
+        start_times = [start_time for start_time in start_times if start_time is not None]
+    columns = {'start_time': np.array(start_times[::-1], dtype=np.int64)}
+    for field, dtype, missing in COLUMNS[1:]:
+        values = [match.get(field) for match in play_data]
+        values = [missing if value is None else value for value in values]
+        columns[field] = np.array(values[::-1], dtype=dtype)
+    return columns
+
+def save_store(store_dir, columns, player_ids, offsets):
+    os.makedirs(store_dir, exist_ok=True)
+    for field, dtype, missing in COLUMNS:
+        np.save(os.path.join(store_dir, field + '.npy'), columns[field])
+    np.save(os.path.join(store_dir, 'player_ids.npy'), np.array(player_ids, dtype=str))
+    np.save(os.path.join(store_dir, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+
+# Parse every player file under json_dir once and write the columnar store.
+# The files are read ahead in background threads (see prefetch)
+def ingest(json_dir, store_dir, verbose=False, backend=None, depth=None, threads=None):
+    parts = dict((field, []) for field, dtype, missing in COLUMNS)
+    player_ids = []
+    offsets = [0]
+    begin = time.perf_counter()
+    for file_path, data in prefetch.read_ahead(list_player_files(json_dir), depth, threads):
+        if verbose: print(file_path)
+        user_id = player_id_from_name(os.path.basename(file_path))
+        instrument.begin_player(user_id, file_path)
+        columns = decode_player_columns(data, backend)
+        instrument.end_player()
+        for field in parts:
+            parts[field].append(columns[field])
+        player_ids.append(user_id)
+        offsets.append(offsets[-1] + len(columns['start_time']))
+    columns = dict()
+    for field, dtype, missing in COLUMNS:
+        if parts[field]: columns[field] = np.concatenate(parts[field])
+        else: columns[field] = np.zeros(0, dtype=dtype)
+    if verbose:
+        seconds = time.perf_counter() - begin
+        print("Decoded " + str(offsets[-1]) + " matches with " + (backend or decoders.default_backend())
+              + " at " + str(int(offsets[-1] / max(seconds, 1e-9))) + " matches/sec")
+    save_store(store_dir, columns, player_ids, offsets)
+    return len(player_ids), offsets[-1]
+
+# Memory-map every column of the store; nothing is read until it is used
+def load_store(store_dir, mmap_mode='r'):
+    store = dict()
+    for field, dtype, missing in COLUMNS:
+        store[field] = np.load(os.path.join(store_dir, field + '.npy'), mmap_mode=mmap_mode)
+    store['player_ids'] = np.load(os.path.join(store_dir, 'player_ids.npy'))
+    store['offsets'] = np.load(os.path.join(store_dir, 'offsets.npy'))
+    return store
+
+def num_players(store):
+    return len(store['player_ids'])
+
+# Return the columns of the i-th player as views into the store
+def player_matches(store, i):
+    begin, end = store['offsets'][i], store['offsets'][i + 1]
+    return dict((field, store[field][begin:end]) for field, dtype, missing in COLUMNS)
+
+# Return the row of a user id in the store, or None if the player is not stored
+def find_player(store, user_id):
+    rows = np.flatnonzero(store['player_ids'] == user_id)
+    if len(rows) == 0: return None
+    return int(rows[0])
+
+def iter_players(store):
+    for i in range(num_players(store)):
+        yield str(store['player_ids'][i]), player_matches(store, i)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: python -m dota_analysis.match_store <json_dir> <store_dir>")
+        sys.exit(1)
+    players, matches = ingest(sys.argv[1], sys.argv[2], verbose=True)
+    print("Stored " + str(matches) + " matches of " + str(players) + " players")
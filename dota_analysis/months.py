@@ -0,0 +1,61 @@
+# Month buckets of match start times
+#
+# A month index counts calendar months (UTC) since January 1970:
+#     year = 1970 + index // 12, month = index % 12 + 1
+# Whole arrays of start times are bucketed in one NumPy operation instead of
+# formatting every match with strftime.
+
+import numpy as np
+
+epoch_year = 1970
+
+# Convert unix start times (seconds) to month indices
+def month_index(start_times):
+    start_times = np.asarray(start_times, dtype=np.int64)
+    return start_times.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+
+def from_year_month(year, month):
+    return (year - epoch_year) * 12 + (month - 1)
+
+# Works on a single index or on an array of indices
+def to_year_month(index):
+    return (epoch_year + index // 12, index % 12 + 1)
+
+# Number of games in each month of [first, last), months outside are ignored
+def count_games(index, first, last):
+    index = np.asarray(index, dtype=np.int64)
+    index = index[(index >= first) & (index < last)]
+    return np.bincount(index - first, minlength=last - first)
+
+# Dense range of months [first, end) as month indices, e.g. the months a
+# player's game counts are kept for
+class MonthWindow(object):
+    def __init__(self, first, end):
+        self.first = int(first)
+        self.end = max(int(end), self.first)
+
+    # Window sized to the months in month_index. A bound given as a year is
+    # used as it is; games outside of it are not counted
+    @classmethod
+    def for_data(cls, month_index, start_year=None, end_year=None):
+        month_index = np.asarray(month_index)
+        if start_year is not None: first = from_year_month(start_year, 1)
+        elif len(month_index): first = int(month_index.min())
+        else: first = 0
+        if end_year is not None: end = from_year_month(end_year, 1)
+        elif len(month_index): end = int(month_index.max()) + 1
+        else: end = first
+        return cls(first, end)
+
+    def __len__(self):
+        return self.end - self.first
+
+    # Number of games in each month of the window
+    def counts(self, month_index):
+        return count_games(month_index, self.first, self.end)
+
+# First and last position with a nonzero count, None if all counts are zero
+def active_range(counts):
+    played = np.flatnonzero(counts)
+    if len(played) == 0: return None
+    return (int(played[0]), int(played[-1]))
@@ -0,0 +1,68 @@
+# Process-pool driver for per-player analysis over the columnar match store
+#
+# Every worker memory-maps the store once and runs
+# analyze_player(user_id, matches) on chunks of consecutive players. Partial
+# results come back in store order and are merged one by one in the parent
+# process, so the merged result is exactly the one of a serial run.
+
+import multiprocessing
+from dota_analysis import match_store
+from dota_analysis import instrument
+
+chunk_size = 64 # players handed to a worker at a time
+
+# state of a worker process, set once by init_worker
+worker_store = None
+worker_analyze = None
+
+def init_worker(store_path, analyze_player, instrumented=False):
+    global worker_store, worker_analyze
+    worker_store = match_store.load_store(store_path)
+    worker_analyze = analyze_player
+    if instrumented and not instrument.enabled: instrument.enable()
+
+# Partial results of the players in the chunk, and the instrument counters
+def analyze_chunk(chunk):
+    begin, end = chunk
+    partials = list()
+    for i in range(begin, end):
+        user_id = str(worker_store['player_ids'][i])
+        instrument.begin_player(user_id)
+        began = instrument.start()
+        matches = match_store.player_matches(worker_store, i)
+        if began is not None:
+            instrument.stop('read', began, len(matches['start_time']),
+                            sum(column.nbytes for column in matches.values()))
+        partials.append(worker_analyze(user_id, matches))
+        instrument.end_player()
+    return partials, instrument.take()
+
+# Split players [0, num_players) into (begin, end) ranges of at most chunk_size
+def player_chunks(num_players, chunk_size):
+    return [(begin, min(begin + chunk_size, num_players))
+            for begin in range(0, num_players, chunk_size)]
+
+# Run analyze_player on every player of the store and fold each partial result
+# into result with merge(partial, result). Players for which analyze_player
+# returns None are skipped. processes=None uses every core, processes=1 runs
+# serially in this process.
+def scan_players(store_path, analyze_player, merge, result, processes=None):
+    num_players = match_store.num_players(match_store.load_store(store_path))
+    chunks = player_chunks(num_players, chunk_size)
+    if processes == 1:
+        init_worker(store_path, analyze_player)
+        for partials, counters in map(analyze_chunk, chunks):
+            instrument.merge(counters)
+            merge_partials(partials, merge, result)
+        return result
+    with multiprocessing.Pool(processes, init_worker,
+                              (store_path, analyze_player, instrument.enabled)) as pool:
+        # imap hands back the chunks in submission order
+        for partials, counters in pool.imap(analyze_chunk, chunks):
+            instrument.merge(counters)
+            merge_partials(partials, merge, result)
+    return result
+
+def merge_partials(partials, merge, result):
+    for partial in partials:
+        if partial is not None: merge(partial, result)
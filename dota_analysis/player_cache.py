@@ -0,0 +1,94 @@
+# Incremental recomputation keyed on per-player file fingerprints
+#
+# The scraper only appends matches to a small fraction of the *_allmatches.json
+# files each day. The cache keeps, for every player file, its fingerprint (size,
+# mtime and content hash) and the partial result of the analysis. On a rerun
+# only new or changed files are parsed and analyzed again; the cached partials
+# of all other players are merged as they are.
+
+import os
+import hashlib
+import pickle
+from dota_analysis import match_store
+from dota_analysis import instrument
+from dota_analysis import prefetch
+
+cache_version = 1
+
+# (size, mtime, content hash) of a file from its stat and its decompressed
+# content. refresh only reads the files whose size or mtime changed
+def file_fingerprint(stat, data):
+    return (stat.st_size, stat.st_mtime_ns, hashlib.sha1(data).hexdigest())
+
+def unchanged(stat, previous):
+    return previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns)
+
+def same_content(fingerprint, other):
+    return fingerprint[0] == other[0] and fingerprint[2] == other[2]
+
+# The cache is thrown away when it was built with other settings, e.g. another
+# game_bar or backtrace, or by another analysis
+def load_cache(cache_path, settings):
+    if not os.path.exists(cache_path): return dict()
+    with open(cache_path, 'rb') as fh:
+        cache = pickle.load(fh)
+    if cache.get('version') != cache_version or cache.get('settings') != settings:
+        return dict()
+    return cache['players']
+
+def save_cache(cache_path, settings, players):
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as fh:
+        pickle.dump({'version': cache_version, 'settings': settings, 'players': players},
+                    fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+
+# Bring the cache up to date with the player files under json_dir.
+# analyze_player(user_id, matches) is only called for new or changed files;
+# entries of deleted files are dropped. Return the cache entries in file order
+# and the number of files that were analyzed again. Files whose size or mtime
+# changed are read ahead in background threads (see prefetch) and their content
+# is hashed and decoded from the same bytes
+def refresh(json_dir, cache_path, analyze_player, settings, depth=None, threads=None):
+    cached = load_cache(cache_path, settings)
+    files = match_store.list_player_files(json_dir)
+    stats = dict()
+    for file_path in files:
+        began = instrument.start()
+        stats[file_path] = os.stat(file_path)
+        instrument.stop('fingerprint', began)
+    to_read = [file_path for file_path in files
+               if not unchanged(stats[file_path], cached.get(file_path, {}).get('fingerprint'))]
+    reads = prefetch.read_ahead(to_read, depth, threads)
+    players = dict()
+    num_changed = 0
+    for file_path in files:
+        entry = cached.get(file_path)
+        if entry is None or not unchanged(stats[file_path], entry['fingerprint']):
+            data = next(reads)[1]
+            began = instrument.start()
+            fingerprint = file_fingerprint(stats[file_path], data)
+            instrument.stop('fingerprint', began, nbytes=len(data))
+            # a file that was only touched keeps its entry, the content hash is the same
+            if entry is None or not same_content(entry['fingerprint'], fingerprint):
+                user_id = match_store.player_id_from_name(os.path.basename(file_path))
+                instrument.begin_player(user_id, file_path)
+                matches = match_store.decode_player_columns(data)
+                entry = {'user_id': user_id,
+                         'partial': analyze_player(user_id, matches)}
+                instrument.end_player()
+                num_changed += 1
+            entry['fingerprint'] = fingerprint
+        players[file_path] = entry
+    save_cache(cache_path, settings, players)
+    return players, num_changed
+
+# Incremental counterpart of parallel_scan.scan_players: fold the partial result
+# of every player file into result with merge(partial, result). Return
+# (result, number of files analyzed again, number of files)
+def scan_cached(json_dir, cache_path, analyze_player, merge, result, settings):
+    players, num_changed = refresh(json_dir, cache_path, analyze_player, settings)
+    for file_path in players:
+        partial = players[file_path]['partial']
+        if partial is not None: merge(partial, result)
+    return result, num_changed, len(players)
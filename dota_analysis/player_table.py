@@ -0,0 +1,237 @@
+# Struct-of-arrays table of per-player statistics
+#
+# Instead of one Player object per user (a dict of 108 months keyed by tuples, a
+# set of hero ids and a few scalars), every statistic is one NumPy column:
+#   user_ids          str                  one row per player
+#   num_matches       int32
+#   win_rate          float32
+#   leaver_rate       float32
+#   hero_diversity    float32
+#   games_each_month  int32   players x months, months counted from window_start
+#   real_start        int16   position of the first and last month with a game,
+#   real_end          int16   -1 if the player has no game in the window
+#   hero_bits         uint8   players x heroes.num_heroes / 8, bit h set if hero h was played
+# The whole table is saved as one .npz file, or as a directory of .npy files
+# that is memory-mapped when loaded.
+#
+#     python -m dota_analysis.player_table <table.npz or directory>
+# prints the size of a saved table next to the estimated size of the old objects.
+
+import sys
+import os
+import numpy as np
+from dota_analysis import months as month_buckets
+from dota_analysis import heroes
+
+column_names = ['user_ids', 'num_matches', 'win_rate', 'leaver_rate', 'hero_diversity',
+                'games_each_month', 'real_start', 'real_end', 'hero_bits']
+
+# Bitmap of the heroes with nonzero usage (see heroes.hero_usage), as one row of hero_bits
+def hero_row(usage):
+    return np.packbits(np.asarray(usage) > 0)
+
+
+class PlayerTable(object):
+    def __init__(self, columns, window_start):
+        self.window_start = window_start # month index of games_each_month[:, 0]
+        for name in column_names:
+            setattr(self, name, columns[name])
+        self.row_of_user = None
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def num_months(self):
+        return self.games_each_month.shape[1]
+
+    # Row of a user id, or None if the user is not in the table
+    def find(self, user_id):
+        if self.row_of_user is None:
+            self.row_of_user = dict((str(user_id), i) for i, user_id in enumerate(self.user_ids))
+        return self.row_of_user.get(str(user_id))
+
+    def hero_ids(self, i):
+        return np.flatnonzero(np.unpackbits(self.hero_bits[i]))
+
+    # players x heroes boolean matrix of the heroes every player used
+    def hero_usage_matrix(self):
+        return np.unpackbits(self.hero_bits, axis=1).astype(bool)
+
+    def month_date(self, position):
+        if position < 0: return (0, 0)
+        return month_buckets.to_year_month(self.window_start + int(position))
+
+    # All statistics of one player as a dict
+    def row(self, i):
+        return {'user_id': str(self.user_ids[i]),
+                'num_matches': int(self.num_matches[i]),
+                'win_rate': float(self.win_rate[i]),
+                'leaver_rate': float(self.leaver_rate[i]),
+                'hero_diversity': float(self.hero_diversity[i]),
+                'games_each_month': self.games_each_month[i],
+                'real_start': self.month_date(self.real_start[i]),
+                'real_end': self.month_date(self.real_end[i]),
+                'hero_set': set(self.hero_ids(i).tolist())}
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in column_names)
+
+    # A path ending in .npz is saved as a single file, anything else as a
+    # directory with one .npy file per column
+    def save(self, path):
+        columns = dict((name, getattr(self, name)) for name in column_names)
+        window_start = np.array([self.window_start], dtype=np.int64)
+        if path.endswith('.npz'):
+            np.savez(path, window_start=window_start, **columns)
+            return
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'window_start.npy'), window_start)
+        for name in columns:
+            np.save(os.path.join(path, name + '.npy'), columns[name])
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        if path.endswith('.npz'):
+            with np.load(path) as saved:
+                columns = dict((name, saved[name]) for name in column_names)
+                window_start = int(saved['window_start'][0])
+            return cls(columns, window_start)
+        columns = dict()
+        for name in column_names:
+            columns[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+        window_start = int(np.load(os.path.join(path, 'window_start.npy'))[0])
+        return cls(columns, window_start)
+
+
+# Collects rows one by one into growing arrays and makes the table at the end.
+# Rows may come with different month windows; the months of the table grow to
+# cover all of them
+class PlayerTableBuilder(object):
+    def __init__(self, num_months=0, window_start=None, capacity=1024):
+        self.size = 0
+        self.num_months = num_months
+        self.window_start = window_start
+        self.user_ids = list()
+        self.columns = None
+        self.capacity = capacity
+
+    def allocate(self, capacity):
+        columns = {'num_matches': np.zeros(capacity, dtype=np.int32),
+                   'win_rate': np.zeros(capacity, dtype=np.float32),
+                   'leaver_rate': np.zeros(capacity, dtype=np.float32),
+                   'hero_diversity': np.zeros(capacity, dtype=np.float32),
+                   'games_each_month': np.zeros((capacity, self.num_months), dtype=np.int32),
+                   'real_start': np.full(capacity, -1, dtype=np.int16),
+                   'real_end': np.full(capacity, -1, dtype=np.int16),
+                   'hero_bits': np.zeros((capacity, heroes.num_heroes // 8), dtype=np.uint8)}
+        if self.columns is not None:
+            for name in columns:
+                columns[name][:self.size] = self.columns[name][:self.size]
+        self.columns = columns
+        self.capacity = capacity
+
+    # Widen games_each_month so that it covers num_months months from window_start
+    def fit_window(self, window_start, num_months):
+        first = min(self.window_start, window_start)
+        end = max(self.window_start + self.num_months, window_start + num_months)
+        if (first, end) == (self.window_start, self.window_start + self.num_months): return
+        shift = self.window_start - first
+        games_each_month = np.zeros((self.capacity, end - first), dtype=np.int32)
+        games_each_month[:self.size, shift:shift + self.num_months] = \
+            self.columns['games_each_month'][:self.size]
+        self.columns['games_each_month'] = games_each_month
+        for name in ['real_start', 'real_end']:
+            positions = self.columns[name][:self.size]
+            positions[positions >= 0] += shift
+        self.window_start = first
+        self.num_months = end - first
+
+    # stats: dict with the keys of engine.PlayerStatsCollector
+    def append(self, stats):
+        if self.columns is None:
+            self.num_months = len(stats['games_each_month'])
+            self.window_start = stats['window_start']
+            self.allocate(self.capacity)
+        elif self.size == self.capacity:
+            self.allocate(2 * self.capacity)
+        self.fit_window(stats['window_start'], len(stats['games_each_month']))
+        shift = stats['window_start'] - self.window_start
+        i = self.size
+        self.user_ids.append(stats['user_id'])
+        self.columns['num_matches'][i] = stats['num_matches']
+        self.columns['win_rate'][i] = stats['win_rate']
+        self.columns['leaver_rate'][i] = stats['leaver_rate']
+        self.columns['hero_diversity'][i] = stats['hero_diversity']
+        self.columns['games_each_month'][i, shift:shift + len(stats['games_each_month'])] = \
+            stats['games_each_month']
+        if stats['first'] is not None:
+            self.columns['real_start'][i] = stats['first'] + shift
+            self.columns['real_end'][i] = stats['last'] + shift
+        self.columns['hero_bits'][i] = stats['hero_bits']
+        self.size += 1
+
+    def finish(self):
+        if self.columns is None:
+            if self.window_start is None: self.window_start = 0
+            self.allocate(0)
+        columns = dict((name, self.columns[name][:self.size].copy()) for name in self.columns)
+        columns['user_ids'] = np.array(self.user_ids, dtype=str)
+        return PlayerTable(columns, self.window_start)
+
+
+# Size in bytes of an object and everything it refers to
+def deep_size(value, seen=None):
+    if seen is None: seen = set()
+    if id(value) in seen: return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key in value:
+            size += deep_size(key, seen) + deep_size(value[key], seen)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += deep_size(item, seen)
+    elif hasattr(value, '__dict__'):
+        size += deep_size(vars(value), seen)
+    return size
+
+# Estimate the memory the old object graph (one object per player with a dict of
+# months keyed by (year, month) and a set of hero ids, plus the five parallel
+# lists and the id_to_user dict of histo_stats.py) would need for this table,
+# by building it for a sample of rows
+def estimate_object_bytes(table, sample_size=1000):
+    class Player(object):
+        pass
+    if len(table) == 0: return 0
+    rows = np.linspace(0, len(table) - 1, min(sample_size, len(table))).astype(np.int64)
+    users = dict()
+    lists = [list() for _ in range(5)]
+    for i in rows.tolist():
+        row = table.row(i)
+        user = Player()
+        user.user_id = row['user_id']
+        user.win_rate = row['win_rate']
+        user.hero_diversity = row['hero_diversity']
+        user.leaver_rate = row['leaver_rate']
+        user.num_matches = row['num_matches']
+        user.games_each_month = dict()
+        for position, count in enumerate(row['games_each_month'].tolist()):
+            user.games_each_month[table.month_date(position)] = count
+        user.real_start_year, user.real_start_month = row['real_start']
+        user.real_end_year, user.real_end_month = row['real_end']
+        user.hero_set = row['hero_set']
+        users[user.user_id] = user
+        for values, value in zip(lists, [user.win_rate, user.hero_diversity, user.leaver_rate,
+                                         user.num_matches, user.user_id]):
+            values.append(value)
+    return deep_size((users, lists)) * len(table) // len(rows)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python -m dota_analysis.player_table <table.npz or directory>")
+        sys.exit(1)
+    table = PlayerTable.load(sys.argv[1])
+    print("Players: " + str(len(table)) + ", months: " + str(table.num_months()))
+    print("Table size: " + str(table.nbytes()) + " bytes")
+    print("Estimated size as Player objects: " + str(estimate_object_bytes(table)) + " bytes")
@@ -0,0 +1,57 @@
+# Read-ahead of player files
+#
+# Reading a player file blocks on the filesystem while the CPU has nothing to
+# do; on the network filesystem that wait is most of the time of a scan.
+# read_ahead keeps the next `depth` files of a list being read by `threads`
+# background threads and hands back their bytes in the order of the list, so
+# decoding and analyzing one file overlaps with reading the following ones.
+# At most depth files are read ahead at any time, however long the list is.
+#
+# read_depth and read_threads below are the defaults of every caller
+# (match_store ingest, player_cache, shards); a depth of 0 reads each file only
+# when it is needed.
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from dota_analysis import instrument
+from dota_analysis import compression
+
+read_depth = 16  # files read ahead of the one being processed
+read_threads = 4 # background reader threads
+
+# Decompressed content of a player file (see compression)
+def read_file(file_path):
+    return compression.read_player_bytes(file_path)
+
+# Yield (file_path, content) for every path of paths, in order. The 'read'
+# stage of instrument counts the time spent waiting for a file
+def read_ahead(paths, depth=None, threads=None):
+    if depth is None: depth = read_depth
+    if threads is None: threads = read_threads
+    paths = iter(paths)
+    if depth <= 0 or threads <= 0:
+        for file_path in paths:
+            began = instrument.start()
+            data = read_file(file_path)
+            instrument.stop('read', began, nbytes=len(data))
+            yield file_path, data
+        return
+    executor = ThreadPoolExecutor(threads)
+    pending = collections.deque()
+    try:
+        for file_path in paths:
+            pending.append((file_path, executor.submit(read_file, file_path)))
+            if len(pending) == depth: break
+        while pending:
+            file_path, future = pending.popleft()
+            # keep depth files in flight while this one is processed
+            for next_path in paths:
+                pending.append((next_path, executor.submit(read_file, next_path)))
+                break
+            began = instrument.start()
+            data = future.result()
+            instrument.stop('read', began, nbytes=len(data))
+            yield file_path, data
+    finally:
+        # reads nobody will use are dropped when the caller stops early
+        executor.shutdown(wait=True, cancel_futures=True)
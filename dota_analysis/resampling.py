@@ -0,0 +1,177 @@
+# Bootstrap confidence intervals and permutation tests for the inactivity
+# results
+#
+# The means of the long inactive periods come from a few events each, so the
+# curve of ratio against period length needs error bars. Both methods draw
+# thousands of resamples at once as index matrices: a block of resamples is one
+# array operation over all events, blocks are sized to max_elements so memory
+# stays bounded. A seed makes the results reproducible.
+#
+# The cost grows with resamples x events, so two shortcuts keep millions of
+# events at a few seconds:
+#   groups with more than exact_group_size events, whose intervals are narrow,
+#   draw the resampled mean from its normal limit (mean, std / sqrt(n))
+#   instead of drawing every event; the result marks them as approximated and
+#   the threshold is a parameter (resample_exact_size in the scripts)
+#   the permutation test draws at most max_permuted_values // events
+#   permutations (never fewer than min_permutations); when that is fewer than
+#   requested, the p-value is the one of the normal limit of r and the report
+#   says so, since few permutations cannot give small p-values
+#
+#     python -m dota_analysis.resampling <events.npz or directory> [column] [resamples]
+# prints the intervals and the correlation test for an event table saved by
+# win_ratio.py or leaver_status.py (see events_path).
+
+import sys
+import math
+import warnings
+import numpy as np
+
+max_elements = 1 << 24 # values drawn per block of resamples
+exact_group_size = 5000
+max_permuted_values = 1 << 25
+min_permutations = 20
+
+def resample_blocks(num_resamples, num_values):
+    block = max(1, max_elements // max(num_values, 1))
+    return [(begin, min(begin + block, num_resamples)) for begin in range(0, num_resamples, block)]
+
+# Mean of the values of every group and its percentile bootstrap interval.
+# Every resample draws, for each group, as many values as the group has from
+# the group itself, except that groups with more than exact_size values
+# (default exact_group_size, float('inf') draws every group) draw the mean
+# from its normal limit. Return a dict of arrays groups, counts, means, low,
+# high and approximated, which is True for the groups that used the normal limit
+def bootstrap_means(groups, values, num_resamples=2000, confidence=0.95, seed=None, exact_size=None):
+    if exact_size is None: exact_size = exact_group_size
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(groups, kind='stable')
+    groups, values = groups[order], values[order]
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    result = {'groups': keys, 'counts': counts,
+              'means': np.zeros(len(keys)), 'low': np.zeros(len(keys)), 'high': np.zeros(len(keys)),
+              'approximated': np.zeros(len(keys), dtype=bool)}
+    if len(values) == 0: return result
+    sums = np.add.reduceat(values, starts)
+    result['means'] = sums / counts
+    rng = np.random.default_rng(seed)
+    means = np.empty((num_resamples, len(keys)))
+    exact = counts <= exact_size
+    result['approximated'] = ~exact
+    if exact.any():
+        # position j of a resample picks a value of the group position j belongs to
+        in_exact = np.repeat(exact, counts)
+        exact_values = values[in_exact]
+        exact_counts = counts[exact]
+        exact_starts = np.concatenate(([0], np.cumsum(exact_counts)[:-1]))
+        group_start = np.repeat(exact_starts, exact_counts)
+        group_size = np.repeat(exact_counts, exact_counts)
+        for begin, end in resample_blocks(num_resamples, len(exact_values)):
+            picks = group_start + (rng.random((end - begin, len(exact_values))) * group_size).astype(np.int64)
+            means[begin:end, exact] = np.add.reduceat(exact_values[picks], exact_starts, axis=1) / exact_counts
+    if not exact.all():
+        squares = np.add.reduceat(values * values, starts)[~exact]
+        large_means = result['means'][~exact]
+        spread = np.sqrt(np.maximum(squares / counts[~exact] - large_means ** 2, 0) / counts[~exact])
+        means[:, ~exact] = large_means + spread * rng.standard_normal((num_resamples, len(large_means)))
+    tail = (1 - confidence) / 2
+    result['low'], result['high'] = np.quantile(means, [tail, 1 - tail], axis=0)
+    return result
+
+# Ranks from 1 to n, ties get the average of their ranks
+def ranks(values):
+    values = np.asarray(values)
+    order = np.argsort(values, kind='stable')
+    unique, first, counts = np.unique(values[order], return_index=True, return_counts=True)
+    result = np.empty(len(values))
+    result[order] = np.repeat(first + (counts + 1) / 2.0, counts)
+    return result
+
+# Centered values scaled to unit length, so that the correlation of two such
+# vectors is their dot product. None when all values are the same
+def standardize(values):
+    values = np.asarray(values, dtype=np.float64) - np.mean(values)
+    norm = np.sqrt(np.dot(values, values))
+    if norm == 0: return None
+    return values / norm
+
+# Correlation coefficient ('pearson' or 'spearman') and its two-sided
+# permutation p-value: the share of random pairings of x and y with a
+# correlation at least as strong. At most max_permuted_values // len(x)
+# permutations are drawn (never fewer than min_permutations); when that is
+# fewer than asked for, the permutation p-value cannot go below
+# 1 / (permutations + 1), so p_value is the p-value of the normal limit of r
+# instead and a warning says so. Return a dict r, p_value, p_method
+# ('permutation' or 'normal'), p_permutation, p_normal, permutations (the
+# number drawn), requested and warning (None when all were drawn)
+def correlation_test(x, y, num_permutations=10000, method='pearson', seed=None):
+    if len(x) != len(y): raise ValueError("x and y must have the same length")
+    if method == 'spearman': x, y = ranks(x), ranks(y)
+    elif method != 'pearson': raise ValueError("unknown correlation method " + str(method))
+    x, y = standardize(x), standardize(y)
+    if x is None or y is None or len(x) < 3:
+        return {'r': float('nan'), 'p_value': float('nan'), 'p_method': 'permutation',
+                'p_permutation': float('nan'), 'p_normal': float('nan'), 'permutations': 0,
+                'requested': num_permutations, 'warning': None}
+    r = float(np.dot(x, y))
+    requested = num_permutations
+    num_permutations = min(num_permutations, max(max_permuted_values // len(y), min_permutations))
+    rng = np.random.default_rng(seed)
+    as_strong = 0
+    for begin, end in resample_blocks(num_permutations, len(y)):
+        shuffled = rng.permuted(np.tile(y, (end - begin, 1)), axis=1)
+        # a small tolerance so that pairings as strong as r are not lost to rounding
+        as_strong += int(np.count_nonzero(np.abs(shuffled @ x) >= abs(r) - 1e-12))
+    p_permutation = (as_strong + 1.0) / (num_permutations + 1)
+    # under no correlation r * sqrt(n - 1) is close to standard normal
+    p_normal = math.erfc(abs(r) * math.sqrt(len(y) - 1) / math.sqrt(2))
+    result = {'r': r, 'p_value': p_permutation, 'p_method': 'permutation', 'p_permutation': p_permutation,
+              'p_normal': p_normal, 'permutations': num_permutations, 'requested': requested, 'warning': None}
+    if num_permutations < requested:
+        result['p_value'] = p_normal
+        result['p_method'] = 'normal'
+        result['warning'] = ("only %d of %d permutations for %d values (max_permuted_values), "
+                             "p_value is the normal approximation" % (num_permutations, requested, len(y)))
+        warnings.warn(result['warning'])
+    return result
+
+# Intervals per period length and the correlation of period length and ratio
+def describe(periods, values, num_resamples=2000, confidence=0.95, seed=None, exact_size=None):
+    return {'intervals': bootstrap_means(periods, values, num_resamples, confidence, seed, exact_size),
+            'pearson': correlation_test(periods, values, num_resamples, 'pearson', seed),
+            'spearman': correlation_test(periods, values, num_resamples, 'spearman', seed),
+            'confidence': confidence,
+            'exact_size': exact_group_size if exact_size is None else exact_size}
+
+def format_report(description):
+    intervals = description['intervals']
+    percent = int(round(description['confidence'] * 100))
+    lines = ["period  events     mean   %d%% interval" % percent]
+    for i in range(len(intervals['groups'])):
+        lines.append("%6d %7d %8.4f   %.4f - %.4f%s" % (intervals['groups'][i], intervals['counts'][i],
+                                                       intervals['means'][i], intervals['low'][i],
+                                                       intervals['high'][i],
+                                                       ' *' if intervals['approximated'][i] else ''))
+    if intervals['approximated'].any():
+        lines.append("* normal approximation of the bootstrap (more than %d events)" % description['exact_size'])
+    for method in ['pearson', 'spearman']:
+        test = description[method]
+        if test['p_method'] == 'permutation':
+            lines.append(method + " r = %.4f, permutation p = %.4g (%d permutations), normal p = %.4g"
+                         % (test['r'], test['p_permutation'], test['permutations'], test['p_normal']))
+        else:
+            lines.append(method + " r = %.4f, normal p = %.4g" % (test['r'], test['p_normal']))
+            lines.append("    warning: " + test['warning'])
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    from dota_analysis import events as event_table
+    if len(sys.argv) not in (2, 3, 4):
+        print("usage: python -m dota_analysis.resampling <events.npz or directory> [column] [resamples]")
+        sys.exit(1)
+    column = sys.argv[2] if len(sys.argv) > 2 else 'normalized'
+    num_resamples = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    values, periods = event_table.EventTable.load(sys.argv[1]).values(column)
+    print(format_report(describe(periods, values, num_resamples, seed=0)))
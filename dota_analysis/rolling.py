@@ -0,0 +1,186 @@
+# Rolling win and leave rates of every player
+#
+# For every match of the columnar store, the win rate and the leave rate
+# (leaver_status other than 0) over the player's last N games and over the
+# last K days up to and including that match. All players are computed at
+# once: one cumulative sum over the concatenated outcomes of a block of
+# players, and the start of each window is the later of the player's first
+# match (from the offsets) and N games back, or the first match less than K
+# days back found with one searchsorted over (player, start_time) keys.
+# Blocks of max_block_matches matches keep memory bounded on large stores.
+#
+# The result is saved as a directory of .npy files next to the store layout
+# and is memory-mapped when loaded:
+#   player_ids.npy, offsets.npy        as in the match store
+#   start_time.npy             int64   every match, in time order per player
+#   win_last_<N>_games.npy     float32
+#   leave_last_<N>_games.npy   float32
+#   win_last_<K>_days.npy      float32
+#   leave_last_<K>_days.npy    float32
+#   games_last_<K>_days.npy    int32   number of games in the K day window
+#   windows.json                       the N and K values
+# RollingRates.series and RollingRates.at look up one player by user id and
+# time, e.g. the form before and after an inactive period.
+#
+#     python -m dota_analysis.rolling <store_dir> <out_dir> [--games 20,100] [--days 7,30]
+
+import os
+import json
+import argparse
+import numpy as np
+from numpy.lib import format as npy_format
+from dota_analysis import match_store
+
+seconds_per_day = 86400
+max_block_matches = 1 << 24
+default_games = [20, 100]
+default_days = [7, 30]
+
+def game_column(outcome, num_games):
+    return outcome + '_last_' + str(num_games) + '_games'
+
+def day_column(outcome, num_days):
+    return outcome + '_last_' + str(num_days) + '_days'
+
+# (column name, dtype) of every output column for these windows
+def output_columns(games, days):
+    columns = [('start_time', np.int64)]
+    for num_games in games:
+        columns += [(game_column('win', num_games), np.float32), (game_column('leave', num_games), np.float32)]
+    for num_days in days:
+        columns += [(day_column('win', num_days), np.float32), (day_column('leave', num_days), np.float32),
+                    (day_column('games', num_days), np.int32)]
+    return columns
+
+# Rolling rates of the matches of consecutive players: start_time, radiant_win
+# and leaver_status concatenated, offsets relative to the block. Return a dict
+# of the output columns
+def block_rates(start_time, radiant_win, leaver_status, offsets, games, days):
+    start_time = np.asarray(start_time, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_matches = len(start_time)
+    player = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    first = offsets[:-1][player]
+    # (player, start_time) keys are sorted if every player's matches are
+    key = (player.astype(np.int64) << 32) + (start_time - start_time.min(initial=0))
+    order = None
+    if num_matches > 1 and np.any(key[1:] < key[:-1]):
+        order = np.argsort(key, kind='stable')
+        key, start_time = key[order], start_time[order]
+    outcomes = {'win': np.asarray(radiant_win), 'leave': np.asarray(leaver_status) != 0}
+    cumulative = dict()
+    for outcome in outcomes:
+        values = outcomes[outcome] if order is None else outcomes[outcome][order]
+        cumulative[outcome] = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    end = np.arange(1, num_matches + 1)
+    result = {'start_time': start_time}
+    for num_games in games:
+        begin = np.maximum(first, end - num_games)
+        for outcome in outcomes:
+            counts = cumulative[outcome][end] - cumulative[outcome][begin]
+            result[game_column(outcome, num_games)] = (counts / (end - begin)).astype(np.float32)
+    for num_days in days:
+        # first match of the player that is less than num_days days older
+        begin = np.searchsorted(key, key - num_days * seconds_per_day, side='right')
+        begin = np.maximum(begin, first)
+        result[day_column('games', num_days)] = (end - begin).astype(np.int32)
+        for outcome in outcomes:
+            counts = cumulative[outcome][end] - cumulative[outcome][begin]
+            result[day_column(outcome, num_days)] = (counts / (end - begin)).astype(np.float32)
+    return result
+
+# Player ranges [begin, end) of about max_block_matches matches each
+def player_blocks(offsets, block_matches=None):
+    if block_matches is None: block_matches = max_block_matches
+    offsets = np.asarray(offsets)
+    targets = np.arange(block_matches, offsets[-1], block_matches)
+    cuts = np.searchsorted(offsets, targets, side='right') - 1
+    bounds = np.unique(np.concatenate([[0], cuts, [len(offsets) - 1]]))
+    return [(int(begin), int(end)) for begin, end in zip(bounds[:-1], bounds[1:])]
+
+# Compute the rolling rates of every player of the store and save them to out_dir
+def build(store_dir, out_dir, games=None, days=None):
+    if games is None: games = default_games
+    if days is None: days = default_days
+    store = match_store.load_store(store_dir)
+    offsets = store['offsets']
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'player_ids.npy'), store['player_ids'])
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    outputs = dict()
+    for name, dtype in output_columns(games, days):
+        outputs[name] = npy_format.open_memmap(os.path.join(out_dir, name + '.npy'), mode='w+',
+                                               dtype=dtype, shape=(int(offsets[-1]),))
+    for begin, end in player_blocks(offsets):
+        first, last = int(offsets[begin]), int(offsets[end])
+        rates = block_rates(store['start_time'][first:last], store['radiant_win'][first:last],
+                            store['leaver_status'][first:last], offsets[begin:end + 1] - first, games, days)
+        for name in outputs:
+            outputs[name][first:last] = rates[name]
+    for name in outputs:
+        outputs[name].flush()
+    with open(os.path.join(out_dir, 'windows.json'), 'w') as windows_file:
+        json.dump({'games': list(games), 'days': list(days)}, windows_file)
+    return RollingRates.load(out_dir)
+
+
+class RollingRates(object):
+    def __init__(self, columns, player_ids, offsets, games, days):
+        self.columns = columns
+        self.player_ids = player_ids
+        self.offsets = offsets
+        self.games = games
+        self.days = days
+        self.row_of_user = None
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    # Row of a user id, or None if the user is not stored
+    def find(self, user_id):
+        if self.row_of_user is None:
+            self.row_of_user = dict((str(user_id), i) for i, user_id in enumerate(self.player_ids))
+        return self.row_of_user.get(str(user_id))
+
+    # (start_time, values) of a column for one player, optionally only the
+    # matches with begin_time <= start_time < end_time
+    def series(self, user_id, column, begin_time=None, end_time=None):
+        row = self.find(user_id)
+        if row is None: raise KeyError("no rolling rates for player " + str(user_id))
+        first, last = int(self.offsets[row]), int(self.offsets[row + 1])
+        start_time = self.columns['start_time'][first:last]
+        begin = 0 if begin_time is None else int(np.searchsorted(start_time, begin_time, side='left'))
+        end = len(start_time) if end_time is None else int(np.searchsorted(start_time, end_time, side='left'))
+        return start_time[begin:end], self.columns[column][first + begin:first + end]
+
+    # Value of a column after the player's last match at or before time, or
+    # nan if the player had no match by then
+    def at(self, user_id, column, time):
+        start_time, values = self.series(user_id, column, end_time=time + 1)
+        if len(values) == 0: return float('nan')
+        return float(values[-1])
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'windows.json')) as windows_file:
+            windows = json.load(windows_file)
+        columns = dict()
+        for name, dtype in output_columns(windows['games'], windows['days']):
+            columns[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+        return cls(columns, np.load(os.path.join(path, 'player_ids.npy')),
+                   np.load(os.path.join(path, 'offsets.npy')), windows['games'], windows['days'])
+
+
+def number_list(text):
+    return [int(part) for part in text.split(',') if part]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rolling win and leave rates of every player of a store")
+    parser.add_argument('store_dir')
+    parser.add_argument('out_dir')
+    parser.add_argument('--games', type=number_list, default=default_games, help="e.g. 20,100")
+    parser.add_argument('--days', type=number_list, default=default_days, help="e.g. 7,30")
+    args = parser.parse_args()
+    rates = build(args.store_dir, args.out_dir, args.games, args.days)
+    print("Rolling rates of " + str(int(rates.offsets[-1])) + " matches of " + str(len(rates))
+          + " players in " + args.out_dir)
@@ -0,0 +1,204 @@
+# Scanning a corpus of many split_player_* shards on several machines
+#
+# 1. A manifest lists every player file of every shard with its size, and cuts
+#    the list into chunks of about the same number of bytes:
+#        python -m dota_analysis.shards manifest <manifest.json> <corpus or shard dir>... [chunks]
+#    A directory that holds split_player_* directories stands for all of them.
+# 2. Any number of nodes that see the same work directory (e.g. on the shared
+#    filesystem) run
+#        python -m dota_analysis.shards work <manifest.json> <work_dir> [processes]
+#    Each node claims the chunks nobody has claimed yet by creating
+#    chunk_<n>.claim, analyzes their files with the engine and writes the
+#    partial result of every player to chunk_<n>.pkl.
+# 3. Once every chunk is done,
+#        python -m dota_analysis.shards merge <manifest.json> <work_dir> <results_file>
+#    merges the partials in manifest order and saves the results like
+#    `python -m dota_analysis.engine`, so they are the same as the ones of a
+#    single-node run over the same files.
+#
+# A node that dies leaves a .claim file without a .pkl file. merge lists such
+# chunks; delete their .claim files and run `work` again to redo them.
+
+import sys
+import os
+import re
+import json
+import socket
+import pickle
+import multiprocessing
+import numpy as np
+from dota_analysis import match_store
+from dota_analysis import engine
+from dota_analysis import instrument
+from dota_analysis import prefetch
+
+# split_player_2 comes before split_player_10
+def shard_order(path):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+# The shard directories under a corpus directory, or the directory itself when
+# it has no split_player_* directories
+def find_shards(path):
+    shards = [os.path.join(path, name) for name in os.listdir(path)
+              if name.startswith('split_player_') and os.path.isdir(os.path.join(path, name))]
+    if not shards: return [path]
+    return sorted(shards, key=shard_order)
+
+# Cut the files into num_chunks runs of consecutive files with about the same
+# number of bytes; return (begin, end) ranges of the file list
+def balanced_chunks(sizes, num_chunks):
+    if len(sizes) == 0: return []
+    num_chunks = max(1, min(num_chunks, len(sizes)))
+    ends = np.cumsum(np.asarray(sizes, dtype=np.float64))
+    targets = ends[-1] * np.arange(1, num_chunks) / num_chunks
+    cuts = np.searchsorted(ends, targets, side='left') + 1
+    bounds = np.unique(np.concatenate([[0], cuts, [len(sizes)]]))
+    return [(int(begin), int(end)) for begin, end in zip(bounds[:-1], bounds[1:])]
+
+def build_manifest(paths, num_chunks):
+    shards = list()
+    for path in paths:
+        shards.extend(find_shards(path))
+    files = list()
+    for shard in shards:
+        files.extend(match_store.list_player_files(shard))
+    sizes = [os.path.getsize(file_path) for file_path in files]
+    return {'shards': shards, 'files': files, 'sizes': sizes,
+            'chunks': balanced_chunks(sizes, num_chunks)}
+
+def save_manifest(manifest_path, manifest):
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+
+def load_manifest(manifest_path):
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def chunk_path(work_dir, chunk, extension):
+    return os.path.join(work_dir, 'chunk_%05d.%s' % (chunk, extension))
+
+# Claim a chunk for this process. Creating the claim file fails if it exists,
+# so only one node gets each chunk
+def claim_chunk(work_dir, chunk):
+    if os.path.exists(chunk_path(work_dir, chunk, 'pkl')): return False
+    try:
+        fd = os.open(chunk_path(work_dir, chunk, 'claim'), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as claim_file:
+        claim_file.write(socket.gethostname() + ' ' + str(os.getpid()) + '\n')
+    return True
+
+
+files_per_task = 64 # files a worker reads ahead and analyzes at a time
+
+# analyzer of a worker process, set once by init_worker
+worker_analyze = None
+
+def init_worker(analyze_player, instrumented=False):
+    global worker_analyze
+    worker_analyze = analyze_player
+    if instrumented and not instrument.enabled: instrument.enable()
+
+# Partial results of a run of files, read ahead in background threads (see
+# prefetch), and the instrument counters
+def analyze_files(files):
+    partials = list()
+    for file_path, data in prefetch.read_ahead(files):
+        user_id = match_store.player_id_from_name(os.path.basename(file_path))
+        instrument.begin_player(user_id, file_path)
+        partials.append(worker_analyze(user_id, match_store.decode_player_columns(data)))
+        instrument.end_player()
+    return partials, instrument.take()
+
+# Analyze the files of one chunk, return the partial result of every file in order
+def analyze_chunk(files, analyzer, pool=None):
+    if pool is None:
+        init_worker(analyzer)
+        results = [analyze_files(files)]
+    else:
+        runs = [files[begin:begin + files_per_task] for begin in range(0, len(files), files_per_task)]
+        results = pool.imap(analyze_files, runs)
+    partials = list()
+    for run_partials, counters in results:
+        instrument.merge(counters)
+        partials.extend(run_partials)
+    return partials
+
+def save_partials(work_dir, chunk, key, partials):
+    path = chunk_path(work_dir, chunk, 'pkl')
+    with open(path + '.tmp', 'wb') as fh:
+        pickle.dump({'key': key, 'partials': partials}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+# Claim and analyze chunks until none are left; return the chunks done here.
+# processes=1 runs in this process, None uses every core
+def work(manifest_path, work_dir, collectors, settings=None, processes=None):
+    manifest = load_manifest(manifest_path)
+    analyzer = engine.PlayerAnalyzer(collectors, settings)
+    os.makedirs(work_dir, exist_ok=True)
+    pool = None
+    if processes != 1:
+        pool = multiprocessing.Pool(processes, init_worker, (analyzer, instrument.enabled))
+    done = list()
+    try:
+        for chunk, (begin, end) in enumerate(manifest['chunks']):
+            if not claim_chunk(work_dir, chunk): continue
+            print("Chunk " + str(chunk) + ": " + str(end - begin) + " player files")
+            partials = analyze_chunk(manifest['files'][begin:end], analyzer, pool)
+            save_partials(work_dir, chunk, analyzer.key(), partials)
+            done.append(chunk)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return done
+
+# Chunks of the manifest that have no partial result yet
+def unfinished_chunks(manifest, work_dir):
+    return [chunk for chunk in range(len(manifest['chunks']))
+            if not os.path.exists(chunk_path(work_dir, chunk, 'pkl'))]
+
+# Merge the partial results of all chunks in order into the final results
+def merge(manifest_path, work_dir, collectors, settings=None):
+    manifest = load_manifest(manifest_path)
+    missing = unfinished_chunks(manifest, work_dir)
+    if missing:
+        raise ValueError("chunks without results: " + ", ".join(str(chunk) for chunk in missing))
+    analyzer = engine.PlayerAnalyzer(collectors, settings)
+    overall = analyzer.start()
+    for chunk in range(len(manifest['chunks'])):
+        with open(chunk_path(work_dir, chunk, 'pkl'), 'rb') as fh:
+            saved = pickle.load(fh)
+        if saved['key'] != analyzer.key():
+            raise ValueError("chunk " + str(chunk) + " was analyzed with other settings")
+        for partial in saved['partials']:
+            if partial is not None: analyzer.merge(partial, overall)
+    return analyzer.finish(overall)
+
+
+usage = """usage: python -m dota_analysis.shards manifest <manifest.json> <corpus or shard dir>... [chunks]
+       python -m dota_analysis.shards work <manifest.json> <work_dir> [processes]
+       python -m dota_analysis.shards merge <manifest.json> <work_dir> <results_file>"""
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    collectors = engine.default_collectors()
+    if command == 'manifest' and len(sys.argv) >= 4:
+        paths = sys.argv[3:]
+        num_chunks = 256
+        if len(paths) > 1 and paths[-1].isdigit(): num_chunks = int(paths.pop())
+        manifest = build_manifest(paths, num_chunks)
+        save_manifest(sys.argv[2], manifest)
+        print(str(len(manifest['files'])) + " player files in " + str(len(manifest['shards']))
+              + " shards, " + str(len(manifest['chunks'])) + " chunks")
+    elif command == 'work' and len(sys.argv) in (4, 5):
+        processes = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        done = work(sys.argv[2], sys.argv[3], collectors, processes=processes)
+        print("Analyzed " + str(len(done)) + " chunks")
+    elif command == 'merge' and len(sys.argv) == 5:
+        results = merge(sys.argv[2], sys.argv[3], collectors)
+        engine.save_results(sys.argv[4], results, collectors)
+    else:
+        print(usage)
+        sys.exit(1)
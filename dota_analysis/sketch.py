@@ -0,0 +1,174 @@
+# Mergeable streaming histograms and quantile sketches
+#
+# Both accumulators take values one at a time or as arrays, use memory that does
+# not grow with the number of values, and can be merged with an accumulator of
+# the same shape from another worker or shard. Merging only adds counts, so the
+# result does not depend on how the values were split or in which order the
+# parts are merged.
+
+import math
+import numpy as np
+
+
+# Counts of values in equal-width bins over [low, high], or bins of equal
+# width on a log scale when log is set (low must then be above 0); values below
+# low or above high are counted separately
+class StreamingHistogram(object):
+    def __init__(self, low=0.0, high=1.0, bins=10, log=False):
+        self.low = float(low)
+        self.high = float(high)
+        self.log = log
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def edges(self):
+        if self.log: return np.geomspace(self.low, self.high, len(self.counts) + 1)
+        return np.linspace(self.low, self.high, len(self.counts) + 1)
+
+    def update(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(values) == 0: return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.underflow += int(np.count_nonzero(values < self.low))
+        self.overflow += int(np.count_nonzero(values > self.high))
+        inside = values[(values >= self.low) & (values <= self.high)]
+        if self.log: position = np.log(inside / self.low) / math.log(self.high / self.low)
+        else: position = (inside - self.low) / (self.high - self.low)
+        # the last bin includes high, like numpy.histogram
+        bins = (position * len(self.counts)).astype(np.int64)
+        self.counts += np.bincount(np.minimum(bins, len(self.counts) - 1), minlength=len(self.counts))
+
+    # (edges, counts) of num_bins equal bins over the observed [min, max], like
+    # numpy.histogram(values, num_bins). Every fine bin is counted in the bin its
+    # center falls in and values outside [low, high] in the first or last bin,
+    # so the counts are exact up to the width of the fine bins
+    def rebin(self, num_bins=10):
+        if self.count == 0: return np.linspace(self.low, self.high, num_bins + 1), np.zeros(num_bins, dtype=np.int64)
+        low, high = self.min, self.max
+        if high <= low: low, high = low - 0.5, high + 0.5 # numpy's range for a single value
+        edges = np.linspace(low, high, num_bins + 1)
+        fine_edges = self.edges()
+        centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+        bins = np.clip(np.floor((centers - low) / (high - low) * num_bins).astype(np.int64), 0, num_bins - 1)
+        counts = np.bincount(bins, weights=self.counts, minlength=num_bins).astype(np.int64)
+        counts[0] += self.underflow
+        counts[-1] += self.overflow
+        return edges, counts
+
+    def merge(self, other):
+        if (self.low, self.high, len(self.counts), self.log) != (other.low, other.high, len(other.counts), other.log):
+            raise ValueError("can only merge histograms with the same bins")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def mean(self):
+        if self.count == 0: return None
+        return self.total / self.count
+
+
+# Quantile sketch with relative accuracy (DDSketch). A value v > 0 goes to bucket
+# ceil(log(v) / log(gamma)) with gamma = (1 + accuracy) / (1 - accuracy), and
+# every bucket maps back to a value within `accuracy` of the values in it.
+# Values up to min_value go to a separate zero bucket, so the number of buckets
+# is bounded by the range [min_value, max_value]. Negative values are not supported
+class QuantileSketch(object):
+    def __init__(self, accuracy=0.01, min_value=1e-6, max_value=1e9):
+        self.accuracy = accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.first_key = self.key(min_value)
+        self.buckets = np.zeros(self.key(max_value) - self.first_key + 1, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+
+    def key(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def update(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(values) == 0: return
+        if values.min() < 0: raise ValueError("QuantileSketch only takes values >= 0")
+        self.count += len(values)
+        small = values <= self.min_value
+        self.zero_count += int(np.count_nonzero(small))
+        values = np.minimum(values[~small], self.max_value)
+        keys = np.ceil(np.log(values) / self.log_gamma).astype(np.int64) - self.first_key
+        self.buckets += np.bincount(keys, minlength=len(self.buckets))
+
+    def merge(self, other):
+        if (self.accuracy, self.min_value, self.max_value) != (other.accuracy, other.min_value, other.max_value):
+            raise ValueError("can only merge sketches with the same parameters")
+        self.buckets += other.buckets
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    # Values at the quantiles q (0 to 1), None when the sketch is empty
+    def quantiles(self, q):
+        if self.count == 0: return None
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        ranks = np.floor(q * (self.count - 1)).astype(np.int64)
+        cumulative = self.zero_count + np.cumsum(self.buckets)
+        positions = np.searchsorted(cumulative, ranks, side='right')
+        keys = self.first_key + np.minimum(positions, len(self.buckets) - 1)
+        values = 2 * self.gamma ** keys / (self.gamma + 1)
+        return np.where(ranks < self.zero_count, 0.0, values)
+
+    def percentiles(self, percents):
+        return self.quantiles(np.asarray(percents, dtype=np.float64) / 100)
+
+
+# Histogram and quantile sketch of one statistic. Single values are buffered
+# and added in blocks of buffer_size
+class Distribution(object):
+    def __init__(self, low=0.0, high=1.0, bins=10, accuracy=0.01, buffer_size=4096, log=False):
+        self.histogram = StreamingHistogram(low, high, bins, log)
+        self.sketch = QuantileSketch(accuracy)
+        self.buffer_size = buffer_size
+        self.pending = list()
+
+    def flush(self):
+        if self.pending:
+            self.histogram.update(self.pending)
+            self.sketch.update(self.pending)
+            self.pending = list()
+
+    def add(self, value):
+        self.pending.append(value)
+        if len(self.pending) >= self.buffer_size: self.flush()
+
+    def update(self, values):
+        self.flush()
+        self.histogram.update(values)
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+
+    def summary(self, percents=(1, 5, 25, 50, 75, 95, 99)):
+        self.flush()
+        percentiles = self.sketch.percentiles(percents)
+        return {'count': self.histogram.count,
+                'mean': self.histogram.mean(),
+                'min': self.histogram.min if self.histogram.count else None,
+                'max': self.histogram.max if self.histogram.count else None,
+                'percentiles': dict(zip(percents, [] if percentiles is None else percentiles.tolist())),
+                'bin_edges': self.histogram.edges().tolist(),
+                'bin_counts': self.histogram.counts.tolist()}
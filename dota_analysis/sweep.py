@@ -0,0 +1,45 @@
+# Parameter sweep over game_bar x backtrace grids, or gap_days x backtrace for
+# the day gap collectors
+#
+# Every grid point is an inactivity collector of dota_analysis.engine, so all of
+# them are computed in one scan. The month counts and the prefix-sum index of a
+# player are built once and shared by all collectors; the inactive runs are found
+# once per game_bar and the ratios before them once per grid point, each as a
+# single array operation.
+
+import json
+
+# Name of a grid point, as used for the result files, e.g. 5Games5Backtrace,
+# or 30Days5Backtrace with unit 'Days'
+def grid_name(game_bar, backtrace, unit='Games'):
+    return str(game_bar) + unit + str(backtrace) + "Backtrace"
+
+# One collector of the given class for every threshold x backtrace
+# combination; the thresholds are game_bar values, or gap_days values with
+# unit 'Days' for the day gap collectors
+def sweep_collectors(collector_class, thresholds, backtraces, unit='Games'):
+    collectors = list()
+    for threshold in thresholds:
+        for backtrace in backtraces:
+            collectors.append(collector_class(threshold, backtrace, name=grid_name(threshold, backtrace, unit)))
+    return collectors
+
+# (threshold, backtrace) of a collector made by sweep_collectors
+def grid_point(collector):
+    if hasattr(collector, 'gap_days'): return (collector.gap_days, collector.backtrace)
+    return (collector.game_bar, collector.backtrace)
+
+# Write one table per grid point into a single json file keyed by grid_name
+# sweep_result is a dict (threshold, backtrace): {inactive period: ratio}
+def write_sweep(file_name, sweep_result, unit='Games'):
+    threshold_name = 'gap_days' if unit == 'Days' else 'game_bar'
+    output = dict()
+    for threshold, backtrace in sorted(sweep_result):
+        table = sweep_result[(threshold, backtrace)]
+        output[grid_name(threshold, backtrace, unit)] = {
+            threshold_name: threshold,
+            'backtrace': backtrace,
+            'result': dict((str(period), table[period]) for period in sorted(table)),
+        }
+    with open(file_name, 'w') as fh:
+        json.dump(output, fh, indent=1)
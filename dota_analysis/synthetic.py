@@ -0,0 +1,145 @@
+# Synthetic *_allmatches.json corpora for benchmarks
+#
+# Writes player files with the same fields as the scraped ones, in shard
+# directories split_player_0, split_player_1, ... of shard_size players each.
+# Every player gets
+#   a number of matches drawn from a lognormal distribution with the given mean
+#   sessions of a few games separated by hours or days, and with probability
+#   gap_prob per session a break of months (the inactive periods)
+#   a pool of hero_pool favourite heroes (popular heroes are more likely) that
+#   most games are played with
+#   a skill level that sets the win rate, and a small leave rate
+# A player's matches only depend on the seed and the player's number, so the
+# same settings always give the same corpus.
+#
+#     python -m dota_analysis.synthetic <out_dir> --players 1000 --matches 200
+
+import sys
+import os
+import json
+import argparse
+import numpy as np
+from dota_analysis import heroes
+from dota_analysis import decoders
+
+default_settings = {
+    'players': 1000,
+    'matches': 200,          # mean number of matches per player
+    'max_matches': 20000,
+    'gap_prob': 0.02,        # chance of a break of months after a session
+    'gap_days': 90,          # mean length of those breaks
+    'hero_pool': 10,         # favourite heroes of every player
+    'num_heroes': 120,       # hero ids are 1 to num_heroes
+    'first_time': 1293840000, # players start between 2011 and 2017
+    'last_start': 1483228800,
+    'shard_size': 10000,     # players per split_player_* directory
+    'seed': 0,
+}
+
+def make_settings(settings=None):
+    result = dict(default_settings)
+    if settings is not None: result.update(settings)
+    if result['num_heroes'] >= heroes.num_heroes:
+        raise ValueError("num_heroes must be below " + str(heroes.num_heroes))
+    return result
+
+def player_id(i):
+    return str(10000000 + i)
+
+# Popularity of the heroes: a few are picked much more often than the rest
+def hero_popularity(settings):
+    weights = 1.0 / np.arange(1, settings['num_heroes'] + 1) ** 0.8
+    return weights / weights.sum()
+
+# Columns of the i-th player's matches in chronological order
+def player_columns(settings, i, popularity=None):
+    if popularity is None: popularity = hero_popularity(settings)
+    rng = np.random.default_rng([settings['seed'], i])
+    mu = np.log(settings['matches']) - 0.5
+    num_matches = int(np.clip(rng.lognormal(mu, 1.0), 1, settings['max_matches']))
+    # 20 minutes to 2 hours between games of a session, a new session after
+    # about a third of the games
+    gaps = rng.uniform(1200, 7200, num_matches)
+    new_session = rng.random(num_matches) < 0.3
+    gaps[new_session] += rng.exponential(1.5 * 86400, np.count_nonzero(new_session))
+    breaks = new_session & (rng.random(num_matches) < settings['gap_prob'])
+    gaps[breaks] += rng.exponential(settings['gap_days'] * 86400, np.count_nonzero(breaks))
+    start = rng.integers(settings['first_time'], settings['last_start'])
+    start_time = start + np.cumsum(gaps).astype(np.int64)
+    pool = rng.choice(settings['num_heroes'], size=min(settings['hero_pool'], settings['num_heroes']),
+                      replace=False, p=popularity) + 1
+    hero_id = np.where(rng.random(num_matches) < 0.8,
+                       rng.choice(pool, num_matches),
+                       rng.choice(settings['num_heroes'], num_matches, p=popularity) + 1)
+    player_slot = rng.integers(0, 5, num_matches) + 128 * rng.integers(0, 2, num_matches)
+    won = rng.random(num_matches) < rng.beta(20, 20)
+    leaver_status = np.where(rng.random(num_matches) < rng.beta(1, 60),
+                             rng.choice([1, 2, 3], num_matches, p=[0.6, 0.3, 0.1]), 0)
+    return {'match_id': np.sort(rng.integers(1, 5000000000, num_matches)),
+            'start_time': start_time,
+            'radiant_win': won == (player_slot < 128),
+            'player_slot': player_slot,
+            'hero_id': hero_id,
+            'leaver_status': leaver_status,
+            'duration': rng.normal(2400, 600, num_matches).clip(600).astype(np.int64),
+            'game_mode': rng.choice([1, 2, 22], num_matches, p=[0.2, 0.1, 0.7]),
+            'lobby_type': rng.choice([0, 7], num_matches),
+            'kills': rng.poisson(7, num_matches),
+            'deaths': rng.poisson(7, num_matches),
+            'assists': rng.poisson(11, num_matches)}
+
+# The list of match dicts of a player file, most recent match first
+def player_matches(columns):
+    names = list(columns)
+    rows = zip(*[columns[name].tolist() for name in names])
+    matches = []
+    for row in rows:
+        match = dict(zip(names, row))
+        match['version'] = None
+        match['skill'] = None
+        match['party_size'] = None
+        matches.append(match)
+    matches.reverse()
+    return matches
+
+# orjson writes the files several times faster when it is installed
+def write_player_file(file_path, matches):
+    if decoders.orjson is not None:
+        with open(file_path, 'wb') as json_file:
+            json_file.write(decoders.orjson.dumps(matches))
+    else:
+        with open(file_path, 'w') as json_file:
+            json.dump(matches, json_file)
+
+def shard_dir(out_dir, settings, i):
+    return os.path.join(out_dir, 'split_player_' + str(i // settings['shard_size']))
+
+# Write the corpus, return the number of matches written
+def generate(out_dir, settings=None, verbose=False):
+    settings = make_settings(settings)
+    popularity = hero_popularity(settings)
+    total = 0
+    for i in range(settings['players']):
+        directory = shard_dir(out_dir, settings, i)
+        if i % settings['shard_size'] == 0:
+            os.makedirs(directory, exist_ok=True)
+            if verbose: print(directory)
+        columns = player_columns(settings, i, popularity)
+        file_path = os.path.join(directory, player_id(i) + '_allmatches.json')
+        write_player_file(file_path, player_matches(columns))
+        total += len(columns['start_time'])
+    return total
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Write a synthetic *_allmatches.json corpus")
+    parser.add_argument('out_dir')
+    for name, value in default_settings.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = vars(parse_args(sys.argv[1:]))
+    out_dir = args.pop('out_dir')
+    total = generate(out_dir, args, verbose=True)
+    print("Wrote " + str(total) + " matches of " + str(args['players']) + " players")
@@ -0,0 +1,29 @@
+# The batch API on matches built in memory
+#
+#     python -m pytest tests
+
+import numpy as np
+from dota_analysis import api
+from dota_analysis import engine
+
+def make_player(num_matches=60):
+    start_time = 1500000000 + np.arange(num_matches) * 86400
+    radiant_win = np.arange(num_matches) % 3 == 0
+    return start_time, radiant_win
+
+def test_without_leaver_status_nobody_left():
+    matches = api.make_matches(*make_player())
+    assert np.count_nonzero(matches['leaver_status']) == 0
+    results = api.analyze_players([('x', matches)], [engine.PlayerStatsCollector()], {'min_games': 0})
+    assert results['player_stats'].leaver_rate.tolist() == [0.0]
+    rates = api.rolling_rates(matches, games=(20,), days=(30,))
+    assert np.all(rates['leave_last_20_games'] == 0)
+    assert np.all(rates['leave_last_30_days'] == 0)
+
+def test_leaver_status_is_counted():
+    start_time, radiant_win = make_player()
+    leaver_status = np.zeros(len(start_time))
+    leaver_status[::6] = 1
+    matches = api.make_matches(start_time, radiant_win, leaver_status)
+    results = api.analyze_players([('x', matches)], [engine.PlayerStatsCollector()], {'min_games': 0})
+    assert np.allclose(results['player_stats'].leaver_rate, [10 / 60.0])
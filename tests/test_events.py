@@ -0,0 +1,32 @@
+# Grouping of the event table
+#
+#     python -m pytest tests
+
+import numpy as np
+from dota_analysis import events
+
+def make_table(player, period, normalized):
+    num_rows = len(player)
+    columns = {'player': np.asarray(player, dtype=np.int32),
+               'start_month': np.zeros(num_rows, dtype=np.int32),
+               'period': np.asarray(period, dtype=np.int16),
+               'games': np.full(num_rows, 5, dtype=np.int16),
+               'ratio': np.asarray(normalized, dtype=np.float64),
+               'normalized': np.asarray(normalized, dtype=np.float64)}
+    player_ids = np.array([str(i) for i in range(max(player) + 1)])
+    return events.EventTable(columns, player_ids)
+
+def test_player_period_means():
+    table = make_table([0, 0, 0, 1], [2, 2, 3, 2], [1.0, 3.0, np.nan, 4.0])
+    players, periods, means = table.player_period_means()
+    assert players.tolist() == [0, 1]
+    assert periods.tolist() == [2, 2]
+    assert means.tolist() == [2.0, 4.0]
+
+def test_player_period_means_large_keys():
+    # player row x period length is past 2^31, as with periods in days
+    table = make_table([0, 800000, 1600000, 1600000], [882, 3000, 882, 882], [1.0, 2.0, 3.0, 5.0])
+    players, periods, means = table.player_period_means()
+    assert players.tolist() == [0, 800000, 1600000]
+    assert periods.tolist() == [882, 3000, 882]
+    assert means.tolist() == [1.0, 2.0, 4.0]
@@ -0,0 +1,102 @@
+# The vectorized inactive runs and backtrace windows against the month by
+# month walk of the original win_ratio.py (find_inactive_period and
+# find_win_ratio), on month arrays already cut to the player's active window
+#
+#     python -m pytest tests
+
+import numpy as np
+from dota_analysis import inactivity
+from dota_analysis import backtrace as backtrace_index
+
+# (start, length) of every inactive period, in the order find_inactive_period
+# reports them. counts[0] and counts[-1] are the first and last active month
+def reference_runs(counts, game_bar):
+    runs = []
+    first_inactive = False
+    inactive_start = False
+    inactive_period = 0
+    inactive_month = None
+    last = len(counts) - 1
+    for month in range(len(counts)):
+        if counts[month] < game_bar: # this month is inactive
+            if inactive_start:
+                inactive_period += 1
+                if month == last: runs.append((inactive_month, inactive_period))
+            elif not first_inactive:
+                first_inactive = True
+                inactive_month = month
+            else: # two inactive months in a row start a period
+                inactive_start = True
+                inactive_period += 2
+                if month == last: runs.append((inactive_month, inactive_period))
+        else:
+            if inactive_start: runs.append((inactive_month, inactive_period))
+            first_inactive = False
+            inactive_start = False
+            inactive_period = 0
+    return runs
+
+# Ratio of positive outcomes over the last `backtrace` games from the month the
+# period starts in back to, but not including, the first month; None without
+# games. games[month] lists the outcomes of a month in time order
+def reference_ratio(games, inactive_month, backtrace):
+    positives = 0
+    num_data = 0
+    for month in range(inactive_month, 0, -1):
+        data_list = games[month]
+        for i in range(len(data_list) - 1, -1, -1):
+            if num_data == backtrace: return float(positives) / backtrace
+            num_data += 1
+            if data_list[i]: positives += 1
+    if num_data != 0: return float(positives) / num_data
+    return None
+
+# Outcomes of every month for these month counts, from a fixed pattern
+def make_games(counts, seed=0):
+    rng = np.random.default_rng(seed)
+    return [list(rng.random(count) < 0.5) for count in counts]
+
+def vectorized_ratios(games, starts, backtrace):
+    month_index = np.repeat(np.arange(len(games)), [len(month) for month in games])
+    outcomes = np.array([outcome for month in games for outcome in month], dtype=bool)
+    index = backtrace_index.build_index(month_index, outcomes)
+    positives, num_games = backtrace_index.backtrace_window(index, 0, np.asarray(starts), backtrace)
+    return [float(p) / n if n > 0 else None for p, n in zip(positives.tolist(), num_games.tolist())]
+
+def check(counts, game_bar, backtrace, seed=0):
+    games = make_games(counts, seed)
+    expected = reference_runs(counts, game_bar)
+    starts, lengths = inactivity.inactive_runs(np.array(counts), game_bar)
+    assert list(zip(starts.tolist(), lengths.tolist())) == expected
+    expected_ratios = [reference_ratio(games, start, backtrace) for start, length in expected]
+    assert vectorized_ratios(games, starts, backtrace) == expected_ratios
+    return expected, expected_ratios
+
+def test_run_at_first_month():
+    runs, ratios = check([1, 0, 2, 6, 7], game_bar=5, backtrace=5)
+    assert runs == [(0, 3)]
+    assert ratios == [None] # no game after the first month before the period
+
+def test_run_reaching_last_active_month():
+    runs, ratios = check([6, 7, 0, 0, 3], game_bar=5, backtrace=5)
+    assert runs == [(2, 3)]
+    runs, ratios = check([6, 7, 9, 2, 1], game_bar=5, backtrace=5)
+    assert runs == [(3, 2)]
+
+def test_fewer_games_than_backtrace():
+    runs, ratios = check([1, 6, 2, 0, 0, 8], game_bar=5, backtrace=10)
+    assert runs == [(2, 3)]
+    games = make_games([1, 6, 2, 0, 0, 8])
+    assert ratios == [float(sum(games[1]) + sum(games[2])) / 8]
+
+def test_single_inactive_months_are_not_periods():
+    runs, ratios = check([6, 2, 7, 1, 9, 3, 5], game_bar=5, backtrace=5)
+    assert runs == []
+
+def test_random_months():
+    rng = np.random.default_rng(1)
+    for seed in range(200):
+        counts = rng.integers(0, 9, rng.integers(1, 40))
+        counts[0] = max(counts[0], 1)
+        counts[-1] = max(counts[-1], 1)
+        check(counts.tolist(), game_bar=int(rng.integers(1, 8)), backtrace=int(rng.integers(1, 12)), seed=seed)
@@ -0,0 +1,27 @@
+# Decoding of player files into the columns of the store
+#
+#     python -m pytest tests
+
+import numpy as np
+from dota_analysis import match_store
+
+def make_match(day, leaver_status=0):
+    return {'start_time': 1500000000 + day * 86400, 'radiant_win': day % 2 == 0,
+            'leaver_status': leaver_status, 'hero_id': 3, 'player_slot': 1}
+
+def test_missing_leaver_status_is_no_leave():
+    play_data = [make_match(day) for day in range(10)][::-1]
+    del play_data[4]['leaver_status']
+    columns = match_store.matches_to_columns(play_data)
+    assert np.count_nonzero(columns['leaver_status']) == 0
+
+def test_matches_without_start_time_are_left_out():
+    play_data = [make_match(day, leaver_status=day % 3) for day in range(10)][::-1]
+    del play_data[2]['start_time']
+    play_data[5]['start_time'] = None
+    columns = match_store.matches_to_columns(play_data)
+    kept = [match for match in play_data if match.get('start_time') is not None][::-1]
+    for field, dtype, missing in match_store.COLUMNS:
+        assert len(columns[field]) == 8
+        assert columns[field].tolist() == [match[field] for match in kept]
+    assert np.all(np.diff(columns['start_time']) > 0)